@@ -5,17 +5,546 @@ Simple API that accepts ERP credentials and returns attendance data.
 No credentials stored - everything passed per request.
 """
 
-import json
+import hashlib
+import hmac
 import os
-from flask import Flask, jsonify, request
+import re
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import httpx
+import orjson
+from flask import Flask, request
 from flask_cors import CORS
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+
 
 app = Flask(__name__)
 CORS(app)
 
+# Chromium flags suited to running inside a container
+BROWSER_ARGS = ["--disable-dev-shm-usage", "--no-sandbox", "--disable-gpu"]
+
+# Attach to one shared Chromium (e.g. a sidecar started with
+# --remote-debugging-port=9222) instead of launching a browser per worker
+CDP_URL = os.environ.get("UNITRACK_CDP_URL", "")
+CDP_CONNECT_ATTEMPTS = 3
+
+# Playwright's sync API is bound to the thread that started it, so scrapes
+# run on a fixed pool of long-lived worker threads. Each worker keeps its own
+# browser and only contexts are per-request; the pool size caps concurrency.
+# Each worker means a Chromium, so the default stays small (cpu_count in a
+# container reports the host's cores, not the container's memory budget).
+SCRAPE_WORKERS = int(os.environ.get("UNITRACK_CONCURRENCY", "2"))
+# Launch one worker's browser at startup so the first scrape doesn't wait
+# for it; the others launch on first use. Set UNITRACK_WARM_BROWSERS=0 to
+# launch that one lazily too.
+WARM_BROWSERS = os.environ.get("UNITRACK_WARM_BROWSERS", "1") != "0"
+# No atexit cleanup: sync Playwright objects can only be used from their own
+# worker thread, not from an exit hook on the main thread. Each driver
+# subprocess ends (and takes its Chromium with it) when this process exits.
+_local = threading.local()
+
+# Cap on browser scrapes running or queued at once, so a burst of requests
+# can't spike Chromium CPU. New scrapes past the cap get an immediate 503.
+MAX_CONTEXTS = int(os.environ.get("UNITRACK_MAX_CONTEXTS", "4"))
+SCRAPE_TIMEOUT = 60
+RETRY_AFTER = 10
+_context_slots = threading.Semaphore(MAX_CONTEXTS)
+
+
+class ServerBusy(Exception):
+    """Every browser scrape slot is taken."""
+
+# Assets the scrape never needs. Set UNITRACK_BLOCK_RESOURCES=0 to load them.
+BLOCK_RESOURCES = os.environ.get("UNITRACK_BLOCK_RESOURCES", "1") != "0"
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media", "stylesheet"})
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "hotjar.com",
+)
+# Small viewport (less to lay out) and no service workers, whose requests
+# would bypass context routing
+CONTEXT_OPTIONS = {
+    "viewport": {"width": 800, "height": 600},
+    "service_workers": "block",
+}
+
+# Login form fields, most specific first: a generic input[type="text"]
+# (say, a search box in the header) must only win if nothing better exists
+USERNAME_SELECTORS = (
+    'input[name="j_username"]',
+    'input[name="username"]',
+    '#username',
+    'input[type="text"]',
+)
+PASSWORD_SELECTORS = (
+    'input[name="j_password"]',
+    'input[name="password"]',
+    '#password',
+    'input[type="password"]',
+)
+SUBMIT_SELECTORS = (
+    'input[type="submit"]',
+    'button[type="submit"]',
+    '#loginbtn',
+    'button:has-text("Login")',
+    'input[value="Login"]',
+)
+# Present once the login form has rendered (any match will do)
+LOGIN_FORM_READY_SELECTOR = ', '.join(PASSWORD_SELECTORS)
+
+# For each list of selectors, the index of the first one (in list order,
+# not DOM order) that matches. exact is false when the browser hit a
+# selector it can't parse (Playwright-only syntax such as :has-text) before
+# finding a match; the rest of that list is then resolved by Playwright.
+FIRST_MATCH_JS = '''(groups) => groups.map((selectors) => {
+    for (let i = 0; i < selectors.length; i++) {
+        try {
+            if (document.querySelector(selectors[i])) return {index: i, exact: true};
+        } catch (e) {
+            return {index: i, exact: false};
+        }
+    }
+    return null;
+})'''
+
+# Menu items that load attendance data when clicked, tried in this order
+# until one of them does
+ATTENDANCE_TRIGGERS = (
+    '#stud2',  # CMRIT specific
+    'text=Attendance',
+    'a:has-text("Attendance")',
+    '[href*="attendance"]',
+    'text=Subject Attendance',
+)
+
+# Raw field names for each attendance value, preferred name first
+SUBJECT_KEYS = ('subject', 'subjectName')
+CODE_KEYS = ('subjectCode', 'code')
+PRESENT_KEYS = ('presentCount', 'present')
+ABSENT_KEYS = ('absentCount', 'absent')
+FACULTY_KEYS = ('facultName', 'facultyName')
+# Student details some ERPs include in each attendance record
+STUDENT_NAME_KEYS = ('studentName', 'studName', 'name', 'student')
+STUDENT_USN_KEYS = ('usn', 'studentUsn', 'studUsn', 'regNo', 'rollNo')
+# Substrings of a record key that mark a JSON payload as attendance data
+ATTENDANCE_KEY_HINTS = ('present', 'absent', 'subject')
+
+# XHR URLs worth downloading while looking for attendance data
+ATTENDANCE_URL_RE = re.compile(r"attendance|subject", re.IGNORECASE)
+# Larger ones aren't attendance lists; don't pull their bodies over CDP
+MAX_CAPTURE_BYTES = 2_000_000
+# How long (ms) to wait for attendance data after each trigger click
+TRIGGER_WAIT_MS = 3000
+
+# Student info on the post-login page: profile elements when the ERP has
+# them, plus the page text to search for a USN (e.g. 1CR21CS001, 4CB22AI001)
+# and the student's name
+STUDENT_INFO_JS = '''() => {
+    const text = el => el ? el.textContent.trim() : null;
+    return {
+        name: text(document.querySelector('.studName, #studName, .student-name, .profile-name')),
+        usn: text(document.querySelector('.studUsn, #studUsn, .student-usn, .usn')),
+        body: document.body.innerText || document.body.textContent,
+    };
+}'''
+USN_RE = re.compile(r"[0-9][A-Z]{2}[0-9]{2}[A-Z]{2,3}[0-9]{3}", re.IGNORECASE)
+WELCOME_RE = re.compile(r"(?:welcome|hi|hello)[,:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)", re.IGNORECASE)
+CAPITALIZED_NAME_RE = re.compile(r"([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)")
+NAME_CHARS_RE = re.compile(r"[A-Za-z\s]+")
+# Menu items and common UI text that get mistaken for names
+NAME_EXCLUDE_WORDS = (
+    'schedule', 'academic', 'function', 'facility', 'facilities',
+    'communication', 'welcome', 'logout', 'login', 'home', 'dashboard',
+    'menu', 'student', 'attendance', 'report', 'profile', 'setting',
+    'notification', 'message', 'calendar', 'exam', 'result', 'fee',
+    'library', 'hostel', 'transport', 'placement', 'admin', 'help',
+    'contact', 'about', 'feedback', 'support', 'service',
+)
+
+# Placeholder subject names some ERPs send for empty rows
+BAD_SUBJECT_NAMES = frozenset({'unknown', 'null', 'none', ''})
+
+# Attendance endpoint used by Spring-based ERPs (e.g. CMRIT)
+ATTENDANCE_API_PATH = "/stu_getSubjectOnChangeWithSemId1.json"
+# Username/password field names tried, in order, for the form login
+LOGIN_FORM_FIELDS = (
+    ("j_username", "j_password"),
+    ("username", "password"),
+)
+
+# Logged-in sessions are reused for this many seconds. Each cache keeps at
+# most SESSION_CACHE_SIZE logins, dropping the least recently used.
+SESSION_TTL = 15 * 60
+SESSION_CACHE_SIZE = 32
+_http_sessions = OrderedDict()  # credentials key -> (expires_at, httpx.Client)
+_http_sessions_lock = threading.Lock()
+_browser_sessions = OrderedDict()  # credentials key -> (expires_at, storage_state, student_info)
+_browser_sessions_lock = threading.Lock()
+
+# Recent /api/fetch results. ERP attendance changes a few times a day at
+# most, so dashboard refreshes within the TTL are served from memory.
+RESULT_CACHE_TTL = 5 * 60
+RESULT_CACHE_SIZE = 1024
+_result_cache = OrderedDict()  # result key -> (expires_at, etag, JSON body)
+_result_cache_lock = threading.Lock()
+# Results are also written here so they survive restarts and are shared by
+# all gunicorn workers. Set UNITRACK_CACHE_DIR to an empty value to disable.
+# Files hold student names and USNs: the directory must be private to us,
+# and expired files are deleted.
+RESULT_CACHE_DIR = os.environ.get(
+    "UNITRACK_CACHE_DIR", os.path.join(tempfile.gettempdir(), "unitrack_cache")
+)
+_cache_dir_ok = None  # Set by cache_dir_ready() on first use
+
+# Cache keys (and so cache file names) are HMACs of the credentials under
+# this secret, so they can't be brute-forced back into passwords. Set
+# UNITRACK_CACHE_SECRET to share the disk cache across workers and restarts;
+# otherwise each process uses its own random secret.
+CACHE_KEY_SECRET = (
+    os.environ.get("UNITRACK_CACHE_SECRET", "").encode() or os.urandom(32)
+)
+_cache_pruned_at = 0.0
+
+# Browser scrapes currently running, so concurrent requests for the same
+# login wait on one scrape instead of each opening a context
+_inflight_scrapes = {}  # result key -> Future
+_inflight_scrapes_lock = threading.Lock()
+
+
+def launch_browser(playwright):
+    """Launch a local Chromium, or connect to the shared one at CDP_URL."""
+    if not CDP_URL:
+        return playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+
+    for attempt in range(1, CDP_CONNECT_ATTEMPTS + 1):
+        try:
+            return playwright.chromium.connect_over_cdp(CDP_URL)
+        except Exception as e:
+            if attempt == CDP_CONNECT_ATTEMPTS:
+                raise
+            print(f"Connecting to {CDP_URL} failed ({e}), retrying")
+            time.sleep(attempt)
+
+
+def get_browser():
+    """Return this thread's warm browser, (re)connecting when needed."""
+    browser = getattr(_local, 'browser', None)
+    if browser is not None and browser.is_connected():
+        return browser
+
+    playwright = getattr(_local, 'playwright', None)
+    if playwright is None:
+        playwright = sync_playwright().start()
+        _local.playwright = playwright
+
+    _local.browser = launch_browser(playwright)
+    return _local.browser
+
+
+def warm_browser():
+    """Pool initializer: start this worker's browser before its first scrape."""
+    try:
+        get_browser()
+    except Exception as e:
+        print(f"Browser warm-up failed, will retry on first scrape: {e}")
+
+
+# No more workers (and browsers) than contexts that can be open at once
+_scrape_pool = ThreadPoolExecutor(
+    max_workers=max(1, min(SCRAPE_WORKERS, MAX_CONTEXTS)),
+    thread_name_prefix="playwright",
+    initializer=warm_browser,
+)
+if WARM_BROWSERS:
+    # Starts the first worker, whose initializer launches its browser
+    _scrape_pool.submit(int)
+
+
+def first_matches(page, groups):
+    """Return, for each list of selectors, its first one present on the page (or None)."""
+    chosen = []
+    for selectors, hit in zip(groups, page.evaluate(FIRST_MATCH_JS, [list(g) for g in groups])):
+        if hit is None:
+            chosen.append(None)
+        elif hit['exact']:
+            chosen.append(selectors[hit['index']])
+        else:
+            rest = selectors[hit['index']:]
+            chosen.append(next((s for s in rest if page.locator(s).count() > 0), None))
+    return chosen
+
+
+def block_unneeded(route):
+    """Abort requests for images, fonts, styles, media and trackers."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+        route.abort()
+    else:
+        route.continue_()
+
+
+def keyed_hash(*parts):
+    """HMAC-SHA256 of the parts under CACHE_KEY_SECRET, as hex."""
+    message = "|".join(parts).encode()
+    return hmac.new(CACHE_KEY_SECRET, message, hashlib.sha256).hexdigest()
+
+
+def credentials_key(erp_url, username, password):
+    """Cache key for a login that doesn't keep the password around."""
+    return keyed_hash(erp_url, username, password)
+
+
+def result_key(erp_url, username, password, api_path):
+    """Cache key for one login's result from one attendance endpoint."""
+    return keyed_hash(erp_url, username, password, api_path)
+
+
+def get_cached_result(key):
+    """Return a fresh (etag, JSON body) for this login, or None."""
+    with _result_cache_lock:
+        entry = _result_cache.get(key)
+        if entry is not None:
+            if entry[0] >= time.time():
+                _result_cache.move_to_end(key)
+                return entry[1], entry[2]
+            del _result_cache[key]
+
+    # Another worker (or a previous run) may have cached it on disk
+    cached = read_cache_file(key)
+    if cached is None:
+        return None
+    expires_at, body = cached
+    return remember_result(key, expires_at, body), body
+
+
+def cache_result(key, result):
+    """Serialize and store a successful result; return (etag, JSON body)."""
+    body = orjson.dumps(result)
+    write_cache_file(key, body)
+    return remember_result(key, time.time() + RESULT_CACHE_TTL, body), body
+
+
+def remember_result(key, expires_at, body):
+    """Put a serialized result in the in-memory LRU and return its ETag."""
+    etag = hashlib.blake2s(body, digest_size=16).hexdigest()
+    with _result_cache_lock:
+        _result_cache[key] = (expires_at, etag, body)
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+    return etag
+
+
+def cache_dir_ready():
+    """Create RESULT_CACHE_DIR, or check an existing one is ours, and make it private."""
+    global _cache_dir_ok
+    if _cache_dir_ok is None:
+        try:
+            os.makedirs(RESULT_CACHE_DIR, mode=0o700, exist_ok=True)
+            # makedirs leaves an existing directory as it was; it may not be ours
+            st = os.lstat(RESULT_CACHE_DIR)
+            if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+                print(f"Result cache disabled: {RESULT_CACHE_DIR} is not a directory we own")
+                _cache_dir_ok = False
+            else:
+                if stat.S_IMODE(st.st_mode) != 0o700:
+                    os.chmod(RESULT_CACHE_DIR, 0o700)
+                _cache_dir_ok = True
+        except OSError as e:
+            print(f"Result cache disabled: {e}")
+            _cache_dir_ok = False
+    return _cache_dir_ok
+
+
+def prune_cache_dir():
+    """Delete expired cache files (and stray temp files), at most once per TTL."""
+    global _cache_pruned_at
+    now = time.time()
+    if now - _cache_pruned_at < RESULT_CACHE_TTL:
+        return
+    _cache_pruned_at = now
+    try:
+        with os.scandir(RESULT_CACHE_DIR) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime + RESULT_CACHE_TTL < now:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+    except OSError as e:
+        print(f"Could not prune result cache: {e}")
+
+
+def read_cache_file(key):
+    """Return (expires_at, body) of this login's cache file if still fresh."""
+    if not RESULT_CACHE_DIR or not cache_dir_ready():
+        return None
+    path = os.path.join(RESULT_CACHE_DIR, f"{key}.json")
+    try:
+        expires_at = os.path.getmtime(path) + RESULT_CACHE_TTL
+        if expires_at < time.time():
+            os.remove(path)
+            return None
+        with open(path, 'rb') as f:
+            return expires_at, f.read()
+    except OSError:
+        return None
+
+
+def write_cache_file(key, body):
+    """Write this login's cache file atomically (readers never see half of it)."""
+    if not RESULT_CACHE_DIR or not cache_dir_ready():
+        return
+    prune_cache_dir()
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=RESULT_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, os.path.join(RESULT_CACHE_DIR, f"{key}.json"))
+    except OSError as e:
+        print(f"Could not write result cache: {e}")
+
+
+def login_failure(url):
+    """Error result if url is the ERP's failed-login page, else None."""
+    url = url.lower()
+    if "login" in url and "error" in url:
+        return {"success": False, "error": "Invalid credentials"}
+    if "authfailed" in url:
+        return {"success": False, "error": "Authentication failed"}
+    return None
+
+
+def get_json_records(client, url):
+    """GET a JSON list of records, or None if the response isn't one."""
+    response = client.get(url)
+    if response.status_code != 200:
+        return None
+    try:
+        data = orjson.loads(response.content)
+    except ValueError:
+        return None
+    return data if isinstance(data, list) and data else None
+
 
-def fetch_attendance_from_erp(erp_url, username, password):
+def fetch_attendance_http(erp_url, username, password, api_path=ATTENDANCE_API_PATH):
+    """
+    Fetch attendance with plain HTTP requests, without a browser.
+
+    Logs in with a form POST to Spring Security's j_spring_security_check
+    (trying each of LOGIN_FORM_FIELDS) and reads the attendance JSON at
+    api_path directly. Sessions are cached per login for SESSION_TTL seconds.
+
+    Returns:
+        Same dict as fetch_attendance_from_erp, or None if this ERP needs
+        a real browser (different login form, JS challenge, HTML instead
+        of JSON). A rejected login returns the error right away, so a
+        wrong password isn't retried with other field names or a browser.
+    """
+    key = credentials_key(erp_url, username, password)
+    api_url = f"{erp_url}{api_path}"
+
+    with _http_sessions_lock:
+        cached = _http_sessions.pop(key, None)
+
+    client = None
+    if cached:
+        expires_at, client = cached
+        if expires_at < time.time():
+            client.close()
+            client = None
+
+    try:
+        data = get_json_records(client, api_url) if client else None
+
+        if data is None:
+            # No session or it expired - log in again
+            if client:
+                client.close()
+            client = httpx.Client(http2=True, follow_redirects=True, timeout=10)
+            for user_field, pass_field in LOGIN_FORM_FIELDS:
+                response = client.post(
+                    f"{erp_url}/j_spring_security_check",
+                    data={user_field: username, pass_field: password},
+                )
+                failure = login_failure(str(response.url))
+                if failure:
+                    client.close()
+                    return failure
+                data = get_json_records(client, api_url)
+                if data is not None:
+                    break
+
+        if data is None:
+            client.close()
+            return None
+    except httpx.HTTPError as e:
+        print(f"HTTP fetch failed, falling back to browser: {e}")
+        if client:
+            client.close()
+        return None
+
+    with _http_sessions_lock:
+        evicted = [_http_sessions.pop(key, None)]
+        _http_sessions[key] = (time.time() + SESSION_TTL, client)
+        while len(_http_sessions) > SESSION_CACHE_SIZE:
+            evicted.append(_http_sessions.popitem(last=False)[1])
+    for entry in evicted:
+        if entry:
+            entry[1].close()
+
+    return build_result(index_records(data), {})
+
+
+def build_result(records, student_info):
+    """Build the /api/fetch success payload from records indexed by index_records()."""
+    processed = process_attendance(records.values())
+
+    # Try to get student info from the data if not found on page
+    if not student_info.get('name') and not student_info.get('usn'):
+        data_student = extract_student_from_data(records.values())
+        if data_student:
+            student_info.update({k: v for k, v in data_student.items() if v})
+
+    return {
+        "success": True,
+        "subjects": processed,
+        "count": len(processed),
+        "student": student_info if student_info else None
+    }
+
+
+def fetch_with_saved_session(state, api_url):
+    """
+    Read the attendance JSON using a saved browser login.
+
+    Returns:
+        List of raw records, or None if the session no longer works
+    """
+    context = get_browser().new_context(storage_state=state, **CONTEXT_OPTIONS)
+    try:
+        # The context's request client shares its cookies; no page needed
+        response = context.request.get(api_url)
+        if not response.ok or 'login' in response.url.lower():
+            return None
+        data = orjson.loads(response.body())
+        return data if isinstance(data, list) and data else None
+    except Exception as e:
+        print(f"Saved session failed: {e}")
+        return None
+    finally:
+        context.close()
+
+
+def fetch_attendance_from_erp(erp_url, username, password, api_path=ATTENDANCE_API_PATH):
     """
     Fetch attendance data from ERP using Playwright.
 
@@ -23,316 +552,336 @@ def fetch_attendance_from_erp(erp_url, username, password):
         erp_url: Base URL of the ERP (e.g., https://erp.cmrit.ac.in)
         username: ERP username
         password: ERP password
+        api_path: Attendance JSON endpoint, read directly with a saved
+            session or when no menu item loads the data
 
     Returns:
         dict with success status and data/error
     """
-    captured_data = []
+    key = credentials_key(erp_url, username, password)
+
+    # Skip the login flow if this user logged in recently
+    with _browser_sessions_lock:
+        cached = _browser_sessions.get(key)
+        if cached:
+            _browser_sessions.move_to_end(key)
+    if cached and cached[0] > time.time():
+        _, state, cached_student = cached
+        records = fetch_with_saved_session(state, f"{erp_url}{api_path}")
+        if records:
+            return build_result(index_records(records), dict(cached_student))
+    if cached:
+        with _browser_sessions_lock:
+            _browser_sessions.pop(key, None)
+
+    captured_data = {}  # (subject, code) -> record, see index_records()
     student_info = {}
 
+    def collect(data, url):
+        """Keep a JSON payload if it looks like attendance data."""
+        if isinstance(data, list) and len(data) > 0:
+            first = data[0]
+            if isinstance(first, dict):
+                if looks_like_attendance(first):
+                    index_records(data, captured_data)
+                    print(f"Captured {len(data)} records from {url}")
+
     def capture_response(response):
         """Capture JSON responses that look like attendance data."""
-        nonlocal student_info
+        if captured_data:
+            return
         try:
-            if response.status == 200:
-                url = response.url.lower()
-                # Look for attendance-related JSON endpoints
-                if '.json' in url or 'attendance' in url or 'subject' in url:
-                    try:
-                        body = response.text()
-                        data = json.loads(body)
-                        if isinstance(data, list) and len(data) > 0:
-                            # Check if it looks like attendance data
-                            first = data[0]
-                            if isinstance(first, dict):
-                                keys = str(first.keys()).lower()
-                                if 'present' in keys or 'absent' in keys or 'subject' in keys:
-                                    captured_data.extend(data)
-                                    print(f"Captured {len(data)} records from {response.url}")
-                    except:
-                        pass
-        except:
+            # Decide from metadata alone before pulling the body over CDP
+            request = response.request
+            if request.resource_type not in ("xhr", "fetch") or request.method not in ("GET", "POST"):
+                return
+            headers = response.headers
+            if (
+                response.status == 200
+                and 'json' in headers.get('content-type', '')
+                and int(headers.get('content-length') or 0) < MAX_CAPTURE_BYTES
+                and ATTENDANCE_URL_RE.search(response.url)
+            ):
+                collect(orjson.loads(response.body()), response.url)
+        except Exception:
             pass
 
-    with sync_playwright() as p:
-        # Launch browser
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
-        page = context.new_page()
-
-        # Listen for responses
-        page.on("response", capture_response)
-
+    # Fresh context per request on the worker's warm browser
+    context = get_browser().new_context(**CONTEXT_OPTIONS)
+    if BLOCK_RESOURCES:
+        context.route("**/*", block_unneeded)
+    page = context.new_page()
+
+    try:
+        # Go to login page
+        login_url = f"{erp_url}/login.htm"
+        print(f"Going to {login_url}")
+        page.goto(login_url, wait_until="domcontentloaded")
+
+        # Fill login form, picking each field's selector in priority order
+        # with one round-trip
+        page.wait_for_selector(LOGIN_FORM_READY_SELECTOR, state="attached", timeout=10000)
+        username_selector, password_selector, submit_selector = first_matches(
+            page, (USERNAME_SELECTORS, PASSWORD_SELECTORS, SUBMIT_SELECTORS)
+        )
+        if not (username_selector and password_selector and submit_selector):
+            return {"success": False, "error": "Login form not found"}
+        page.fill(username_selector, username)
+        page.fill(password_selector, password)
+        page.click(submit_selector)
+
+        # Wait until we leave the login page (or land on its error variant)
         try:
-            # Go to login page
-            login_url = f"{erp_url}/login.htm"
-            print(f"Going to {login_url}")
-            page.goto(login_url, wait_until="networkidle")
-
-            # Fill login form - try common selectors
-            username_selectors = [
-                'input[name="j_username"]',
-                'input[name="username"]',
-                '#username',
-                'input[type="text"]'
-            ]
-            password_selectors = [
-                'input[name="j_password"]',
-                'input[name="password"]',
-                '#password',
-                'input[type="password"]'
-            ]
-
-            # Find and fill username
-            for selector in username_selectors:
-                try:
-                    if page.locator(selector).count() > 0:
-                        page.fill(selector, username)
-                        print(f"Filled username with {selector}")
-                        break
-                except:
-                    continue
-
-            # Find and fill password
-            for selector in password_selectors:
-                try:
-                    if page.locator(selector).count() > 0:
-                        page.fill(selector, password)
-                        print(f"Filled password with {selector}")
-                        break
-                except:
-                    continue
-
-            # Submit form
-            submit_selectors = [
-                'input[type="submit"]',
-                'button[type="submit"]',
-                '#loginbtn',
-                'button:has-text("Login")',
-                'input[value="Login"]'
-            ]
-
-            for selector in submit_selectors:
-                try:
-                    if page.locator(selector).count() > 0:
-                        page.click(selector)
-                        print(f"Clicked submit with {selector}")
-                        break
-                except:
-                    continue
-
-            # Wait for navigation
-            page.wait_for_load_state("networkidle")
-            page.wait_for_timeout(3000)
+            page.wait_for_url(
+                lambda url: 'login' not in url.lower() or 'error' in url.lower() or 'authfailed' in url.lower(),
+                timeout=10000,
+            )
+        except PlaywrightTimeoutError:
+            pass
 
-            # Check if login failed
-            if "login" in page.url.lower() and "error" in page.url.lower():
-                browser.close()
-                return {"success": False, "error": "Invalid credentials"}
+        # Check if login failed
+        failure = login_failure(page.url)
+        if failure:
+            return failure
 
-            if "authfailed" in page.url.lower():
-                browser.close()
-                return {"success": False, "error": "Authentication failed"}
+        print(f"After login, URL: {page.url}")
 
-            print(f"After login, URL: {page.url}")
+        # Try to extract student info from the page
+        try:
+            # One round-trip for the raw text; parsing happens here in Python
+            page_text = page.evaluate(STUDENT_INFO_JS)
+            info = extract_student_from_page(
+                page_text['body'] or '', page_text['name'], page_text['usn']
+            )
+
+            if info.get('name'):
+                student_info['name'] = info['name']
+            if info.get('usn'):
+                student_info['usn'] = info['usn']
+
+            print(f"Student info from page: {student_info}")
+        except Exception as e:
+            print(f"Error getting student info: {e}")
 
-            # Try to extract student info from the page
-            try:
-                # Use JavaScript to search the entire page for student info
-                info = page.evaluate('''() => {
-                    let result = { name: null, usn: null };
-
-                    // Words to exclude (menu items, common UI text)
-                    let excludeWords = [
-                        'schedule', 'academic', 'function', 'facility', 'facilities',
-                        'communication', 'welcome', 'logout', 'login', 'home', 'dashboard',
-                        'menu', 'student', 'attendance', 'report', 'profile', 'setting',
-                        'notification', 'message', 'calendar', 'exam', 'result', 'fee',
-                        'library', 'hostel', 'transport', 'placement', 'admin', 'help',
-                        'contact', 'about', 'feedback', 'support', 'service'
-                    ];
-
-                    function isValidName(text) {
-                        if (!text || text.length < 3 || text.length > 50) return false;
-                        let lower = text.toLowerCase();
-                        // Check if it contains any exclude words
-                        for (let word of excludeWords) {
-                            if (lower.includes(word)) return false;
-                        }
-                        // Name should only contain letters and spaces
-                        if (!/^[A-Za-z\\s]+$/.test(text)) return false;
-                        // Should have at least 2 parts or be a single reasonable name
-                        let parts = text.trim().split(/\\s+/);
-                        if (parts.length === 1 && parts[0].length < 4) return false;
-                        return true;
-                    }
-
-                    // Get all text content
-                    let bodyText = document.body.innerText || document.body.textContent;
-
-                    // Look for USN pattern (e.g., 1CR21CS001, 4CB22AI001)
-                    let usnMatch = bodyText.match(/[0-9][A-Z]{2}[0-9]{2}[A-Z]{2,3}[0-9]{3}/i);
-                    if (usnMatch) {
-                        result.usn = usnMatch[0].toUpperCase();
-                    }
-
-                    // Look for "Welcome, Name" or "Hi, Name" pattern first
-                    let welcomeMatch = bodyText.match(/(?:welcome|hi|hello)[,:\\s]+([A-Z][a-z]+(?:\\s+[A-Z][a-z]+)*)/i);
-                    if (welcomeMatch && isValidName(welcomeMatch[1])) {
-                        result.name = welcomeMatch[1];
-                    }
-
-                    // Look for name near USN if found
-                    if (!result.name && result.usn) {
-                        let usnIndex = bodyText.indexOf(result.usn);
-                        if (usnIndex > 0) {
-                            // Check text around USN (before and after)
-                            let before = bodyText.substring(Math.max(0, usnIndex - 80), usnIndex);
-                            let after = bodyText.substring(usnIndex + result.usn.length, usnIndex + 80);
-
-                            // Look for name pattern - multiple capitalized words
-                            let patterns = [before, after];
-                            for (let text of patterns) {
-                                let nameMatch = text.match(/([A-Z][a-z]+(?:\\s+[A-Z][a-z]+)+)/);
-                                if (nameMatch && isValidName(nameMatch[1])) {
-                                    result.name = nameMatch[1];
-                                    break;
-                                }
-                            }
-                        }
-                    }
-
-                    return result;
-                }''')
-
-                if info.get('name'):
-                    student_info['name'] = info['name']
-                if info.get('usn'):
-                    student_info['usn'] = info['usn']
-
-                print(f"Student info from page: {student_info}")
-            except Exception as e:
-                print(f"Error getting student info: {e}")
-
-            # Try to trigger attendance data
-            # Click on attendance menu items
-            attendance_triggers = [
-                '#stud2',  # CMRIT specific
-                'text=Attendance',
-                'a:has-text("Attendance")',
-                '[href*="attendance"]',
-                'text=Subject Attendance',
-            ]
-
-            for trigger in attendance_triggers:
+        # Click attendance menu items in priority order until one loads
+        # attendance. Only these clicks load it, so responses are watched
+        # just while they run, and the listener stays attached until the
+        # data has arrived: other JSON (menus, i18n) may answer first
+        page.on("response", capture_response)
+        try:
+            for trigger in ATTENDANCE_TRIGGERS:
                 try:
-                    elem = page.locator(trigger)
-                    if elem.count() > 0 and elem.first.is_visible():
-                        elem.first.click()
-                        page.wait_for_timeout(3000)
-                        print(f"Clicked {trigger}")
+                    elem = page.locator(trigger).first
+                    if not elem.is_visible():
+                        continue
+                    elem.click(timeout=3000)
+                    print(f"Clicked {trigger}")
+                    # Move on as soon as the listener has the data
+                    for _ in range(TRIGGER_WAIT_MS // 100):
+                        page.wait_for_timeout(100)
                         if captured_data:
                             break
                 except Exception as e:
                     print(f"Trigger {trigger} failed: {e}")
-                    continue
+                if captured_data:
+                    break
+        finally:
+            page.remove_listener("response", capture_response)
 
-            # If still no data, try direct API call
-            if not captured_data:
-                try:
-                    api_url = f"{erp_url}/stu_getSubjectOnChangeWithSemId1.json"
-                    page.goto(api_url)
-                    page.wait_for_timeout(2000)
-                except:
-                    pass
-
-            browser.close()
-
-            if captured_data:
-                # Process data
-                processed = process_attendance(captured_data)
-
-                # Try to get student info from the data if not found on page
-                if not student_info.get('name') and not student_info.get('usn'):
-                    data_student = extract_student_from_data(captured_data)
-                    if data_student:
-                        student_info.update({k: v for k, v in data_student.items() if v})
-
-                return {
-                    "success": True,
-                    "subjects": processed,
-                    "count": len(processed),
-                    "student": student_info if student_info else None
-                }
-            else:
-                return {"success": False, "error": "No attendance data found. Make sure you're enrolled and have attendance records."}
-
-        except Exception as e:
-            browser.close()
-            return {"success": False, "error": str(e)}
+        # If still no data, try direct API call
+        if not captured_data:
+            try:
+                api_url = f"{erp_url}{api_path}"
+                response = page.goto(api_url, wait_until="domcontentloaded")
+                if response and response.ok:
+                    collect(orjson.loads(response.body()), response.url)
+            except:
+                pass
+
+        if captured_data:
+            # Remember the login so the next request can skip it
+            state = context.storage_state()
+            with _browser_sessions_lock:
+                _browser_sessions[key] = (time.time() + SESSION_TTL, state, dict(student_info))
+                _browser_sessions.move_to_end(key)
+                while len(_browser_sessions) > SESSION_CACHE_SIZE:
+                    _browser_sessions.popitem(last=False)
+
+            return build_result(captured_data, student_info)
+        else:
+            return {"success": False, "error": "No attendance data found. Make sure you're enrolled and have attendance records."}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    finally:
+        context.close()
+
+
+def submit_scrape(key, erp_url, username, password, api_path):
+    """Start a browser scrape on the pool, or join the one already running for this login and endpoint.
+
+    Raises ServerBusy if a new scrape is needed and all MAX_CONTEXTS slots are taken.
+    """
+    with _inflight_scrapes_lock:
+        future = _inflight_scrapes.get(key)
+        if future is not None:
+            return future
+        if not _context_slots.acquire(blocking=False):
+            raise ServerBusy()
+        try:
+            future = _scrape_pool.submit(fetch_attendance_from_erp, erp_url, username, password, api_path)
+        except BaseException:
+            _context_slots.release()
+            raise
+        _inflight_scrapes[key] = future
+
+    def forget(done):
+        _context_slots.release()
+        with _inflight_scrapes_lock:
+            if _inflight_scrapes.get(key) is done:
+                del _inflight_scrapes[key]
+
+    future.add_done_callback(forget)
+    return future
+
+
+def is_valid_name(text):
+    """Check that text looks like a person's name rather than UI text."""
+    if not text or len(text) < 3 or len(text) > 50:
+        return False
+    lower = text.lower()
+    if any(word in lower for word in NAME_EXCLUDE_WORDS):
+        return False
+    # Letters and spaces only
+    if not NAME_CHARS_RE.fullmatch(text):
+        return False
+    # A single-word name should be a reasonable length
+    return len(text.split()) > 1 or len(text.strip()) >= 4
+
+
+def extract_student_from_page(body_text, profile_name, profile_usn):
+    """Find the student's name and USN on the post-login page."""
+    info = {'name': None, 'usn': None}
+
+    # Dedicated profile elements are the most reliable source
+    if is_valid_name(profile_name):
+        info['name'] = profile_name
+
+    usn_match = (profile_usn and USN_RE.search(profile_usn)) or USN_RE.search(body_text)
+    if usn_match:
+        info['usn'] = usn_match.group().upper()
+
+    # "Welcome, Name" or "Hi, Name"
+    if not info['name']:
+        welcome_match = WELCOME_RE.search(body_text)
+        if welcome_match and is_valid_name(welcome_match.group(1)):
+            info['name'] = welcome_match.group(1)
+
+    # Capitalized words just before or after the USN. As in the original
+    # in-page script, the upper-cased USN is looked up and both 80-character
+    # windows are measured from where it starts
+    if not info['name'] and usn_match:
+        usn = info['usn']
+        usn_index = body_text.find(usn)
+        if usn_index > 0:
+            before = body_text[max(0, usn_index - 80):usn_index]
+            after = body_text[usn_index + len(usn):usn_index + 80]
+            for text in (before, after):
+                name_match = CAPITALIZED_NAME_RE.search(text)
+                if name_match and is_valid_name(name_match.group(1)):
+                    info['name'] = name_match.group(1)
+                    break
+
+    return info
 
 
 def extract_student_from_data(raw_data):
     """Try to extract student info from attendance records."""
     for item in raw_data:
         if isinstance(item, dict):
-            # Check for student name fields
-            name = item.get('studentName') or item.get('studName') or item.get('name') or item.get('student')
-            usn = item.get('usn') or item.get('studentUsn') or item.get('studUsn') or item.get('regNo') or item.get('rollNo')
+            # First non-empty value of each field
+            get = item.get
+            name = next(filter(None, map(get, STUDENT_NAME_KEYS)), None)
+            usn = next(filter(None, map(get, STUDENT_USN_KEYS)), None)
 
             if name or usn:
                 return {'name': name, 'usn': usn}
     return None
 
 
+def index_records(records, index=None):
+    """Index raw records by (subject, code); a later duplicate replaces an earlier one."""
+    if index is None:
+        index = {}
+    for item in records:
+        if isinstance(item, dict):
+            index[get_either(item, SUBJECT_KEYS), get_either(item, CODE_KEYS)] = item
+    return index
+
+
+def looks_like_attendance(record):
+    """Check whether any key of a JSON record contains an ATTENDANCE_KEY_HINTS word."""
+    for key in record:
+        key = key.lower()
+        if any(hint in key for hint in ATTENDANCE_KEY_HINTS):
+            return True
+    return False
+
+
+def get_either(item, keys, default=None):
+    """Return item[keys[0]], or item[keys[1]] if the first is missing or None."""
+    get = item.get
+    value = get(keys[0])
+    return value if value is not None else get(keys[1], default)
+
+
 def process_attendance(raw_data):
     """Process raw attendance data into standard format."""
-    processed = []
-    seen_subjects = set()  # Track duplicates
+    processed = {}  # (code, name) -> row; later rows win
 
     for item in raw_data:
         try:
             # Try different field names
-            subject_name = item.get('subject', item.get('subjectName', ''))
-            subject_code = item.get('subjectCode', item.get('code', ''))
+            subject_name = get_either(item, SUBJECT_KEYS, '')
+            subject_code = get_either(item, CODE_KEYS, '')
 
             # Skip if no valid subject name or code
-            if not subject_name or subject_name.lower() in ['unknown', 'null', 'none', '']:
+            if not subject_name or subject_name.lower() in BAD_SUBJECT_NAMES:
                 if not subject_code:
                     continue
                 subject_name = subject_code  # Use code as name if no name
 
-            # Skip duplicates
-            key = f"{subject_name}_{subject_code}"
-            if key in seen_subjects:
-                continue
-            seen_subjects.add(key)
-
-            present = int(item.get('presentCount', item.get('present', 0)))
-            absent = int(item.get('absentCount', item.get('absent', 0)))
+            present = int(get_either(item, PRESENT_KEYS, 0))
+            absent = int(get_either(item, ABSENT_KEYS, 0))
             total = present + absent
             percentage = (present / total * 100) if total > 0 else 0
+            faculty = get_either(item, FACULTY_KEYS) or ''
 
-            processed.append({
+            processed[subject_code, subject_name] = {
                 'subject': subject_name,
                 'subject_code': subject_code,
                 'present': present,
                 'absent': absent,
                 'total': total,
                 'percentage': round(percentage, 2),
-                'faculty': item.get('facultName', item.get('facultyName', '')).strip() if item.get('facultName') or item.get('facultyName') else '',
-            })
+                'faculty': faculty.strip(),
+            }
         except Exception as e:
             print(f"Error processing record: {e}")
             continue
 
-    return processed
+    return list(processed.values())
+
+
+def ojsonify(payload, status=200):
+    """Like jsonify(), but serialized with orjson."""
+    return app.response_class(orjson.dumps(payload), status=status, mimetype='application/json')
 
 
 @app.route('/')
 def home():
     """Home page."""
-    return jsonify({
+    return ojsonify({
         "name": "UniTrack API",
         "version": "1.0.0",
         "endpoints": {
@@ -345,7 +894,7 @@ def home():
 @app.route('/api/health')
 def health():
     """Health check."""
-    return jsonify({"status": "ok"})
+    return ojsonify({"status": "ok"})
 
 
 @app.route('/api/fetch', methods=['POST'])
@@ -357,20 +906,21 @@ def fetch_attendance():
     {
         "erp_url": "https://erp.university.edu",
         "username": "student@email.com",
-        "password": "password123"
+        "password": "password123",
+        "attendance_api": "/stu_getSubjectOnChangeWithSemId1.json"  (optional)
     }
     """
     data = request.get_json()
 
     if not data:
-        return jsonify({"success": False, "error": "No data provided"}), 400
+        return ojsonify({"success": False, "error": "No data provided"}, 400)
 
     erp_url = data.get('erp_url', '').strip()
     username = data.get('username', '').strip()
     password = data.get('password', '')
 
     if not erp_url or not username or not password:
-        return jsonify({"success": False, "error": "Missing required fields: erp_url, username, password"}), 400
+        return ojsonify({"success": False, "error": "Missing required fields: erp_url, username, password"}, 400)
 
     # Remove trailing slash from URL
     erp_url = erp_url.rstrip('/')
@@ -379,16 +929,52 @@ def fetch_attendance():
     if not erp_url.startswith('http'):
         erp_url = 'https://' + erp_url
 
-    print(f"Fetching attendance for {username} from {erp_url}")
+    # Attendance endpoint already discovered by the client (e.g. the CLI's
+    # erp.attendance_api); only paths on the ERP itself are accepted
+    api_path = (data.get('attendance_api') or ATTENDANCE_API_PATH).strip()
+    if api_path.startswith(erp_url):
+        api_path = api_path[len(erp_url):]
+    if not api_path.startswith('/'):
+        return ojsonify({"success": False, "error": "attendance_api must be a path on the ERP"}, 400)
 
-    result = fetch_attendance_from_erp(erp_url, username, password)
+    # Results differ per endpoint, so the endpoint is part of the key
+    key = result_key(erp_url, username, password, api_path)
+    cached = get_cached_result(key)
 
-    if result.get('success'):
-        return jsonify(result)
+    if cached:
+        etag, body = cached
     else:
-        return jsonify(result), 401 if 'credential' in result.get('error', '').lower() else 500
+        print(f"Fetching attendance for {username} from {erp_url}")
+
+        # Plain HTTP first; only start a browser if the ERP needs one
+        result = fetch_attendance_http(erp_url, username, password, api_path)
+        if result is None:
+            try:
+                future = submit_scrape(key, erp_url, username, password, api_path)
+                result = future.result(timeout=SCRAPE_TIMEOUT)
+            except (ServerBusy, FutureTimeoutError):
+                response = ojsonify({"success": False, "error": "Server busy, please retry shortly"}, 503)
+                response.headers['Retry-After'] = str(RETRY_AFTER)
+                return response
+
+        if not result.get('success'):
+            return ojsonify(result, 401 if 'credential' in result.get('error', '').lower() else 500)
+
+        etag, body = cache_result(key, result)
+
+    # The body is serialized once, when cached, and sent as-is from then on
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={RESULT_CACHE_TTL}'
+    return response
 
 
 if __name__ == '__main__':
+    # Multi-threaded WSGI server for running without gunicorn (e.g. locally)
+    from waitress import serve
+
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    serve(app, host='0.0.0.0', port=port, threads=16)
@@ -0,0 +1,20 @@
+"""
+Gunicorn settings for the UniTrack backend.
+
+gevent workers are not used: gevent's monkey-patching doesn't mix with
+Playwright's sync API. Each worker process keeps its own pool of warm
+browsers, and gthread threads keep accepting requests while others wait
+on a scrape.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+keepalive = 30
+timeout = 120
+# The app launches its browsers at import time; they must be started in
+# each worker, never in the master and then shared across the fork
+preload_app = False
@@ -0,0 +1,79 @@
+"""
+Tests for the cloud backend's student info extraction.
+
+Expected results follow the in-page script these functions replaced.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+for module in ("flask", "flask_cors", "httpx", "playwright"):
+    pytest.importorskip(module)
+
+# Importing the backend must not launch a browser
+os.environ["UNITRACK_WARM_BROWSERS"] = "0"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import app as backend  # noqa: E402
+
+
+@pytest.mark.parametrize('text, valid', [
+    ('Asha Kumar', True),
+    ('Ravi', True),
+    ('Al B', True),
+    ('Ram', False),          # One short word
+    ('Student Portal', False),
+    ('R2D2 Unit', False),
+    ('   ', False),
+    ('', False),
+    (None, False),
+    ('A' * 51, False),
+])
+def test_is_valid_name(text, valid):
+    assert backend.is_valid_name(text) is valid
+
+
+@pytest.mark.parametrize('body, profile_name, profile_usn, expected', [
+    # Profile elements win
+    ('Welcome, Ravi Shankar', 'Asha Kumar', 'USN: 1cr21cs001',
+     {'name': 'Asha Kumar', 'usn': '1CR21CS001'}),
+    # Invalid profile name: fall back to the greeting
+    ('Hello, Asha Kumar | 1CR21CS001', 'Student Dashboard', None,
+     {'name': 'Asha Kumar', 'usn': '1CR21CS001'}),
+    # No greeting: use the name before the USN
+    ('Logout | Ravi Shankar 1CR21CS045 | Help', None, None,
+     {'name': 'Ravi Shankar', 'usn': '1CR21CS045'}),
+    # ...or after it
+    ('\n1CR21CS045 Priya Nair', None, None,
+     {'name': 'Priya Nair', 'usn': '1CR21CS045'}),
+    # The window after the USN ends 80 characters from where the USN starts
+    ('x1CR21CS045' + ' ' * 75 + 'Priya Nair', None, None,
+     {'name': None, 'usn': '1CR21CS045'}),
+    # The upper-cased USN isn't on the page, so no name is looked for near it
+    ('x Ravi Shankar 1cr21cs045', None, None,
+     {'name': None, 'usn': '1CR21CS045'}),
+    # USN at the very start has nothing before it to search
+    ('1CR21CS045 Priya Nair', None, None,
+     {'name': None, 'usn': '1CR21CS045'}),
+    ('Dashboard | Attendance | Logout', None, None,
+     {'name': None, 'usn': None}),
+])
+def test_extract_student_from_page(body, profile_name, profile_usn, expected):
+    assert backend.extract_student_from_page(body, profile_name, profile_usn) == expected
+
+
+def test_extract_student_from_data():
+    records = [
+        'not a record',
+        {'subject': 'Mathematics'},
+        {'studName': '', 'name': 'Asha Kumar', 'regNo': '1CR21CS001'},
+        {'studentName': 'Someone Else'},
+    ]
+    assert backend.extract_student_from_data(records) == {'name': 'Asha Kumar', 'usn': '1CR21CS001'}
+
+
+def test_extract_student_from_data_none():
+    assert backend.extract_student_from_data([{'subject': 'Mathematics'}, []]) is None
@@ -0,0 +1,137 @@
+"""
+Tests for the attendance calculator.
+
+Expected values were produced by the original per-subject implementation,
+so the column-based analyze_all() must reproduce them exactly.
+"""
+
+import pytest
+
+from unitrack.core.calculator import AttendanceCalculator, Status
+from unitrack.core.config import Thresholds
+
+
+SUBJECTS = [
+    {'subject': 'Mathematics', 'subject_code': 'MA101', 'present': 40, 'total': 45,
+     'percentage': 88.89, 'faculty': 'Dr. Rao', 'term': 'SEM 3'},
+    # No percentage: worked out from present / total
+    {'subject': 'Physics', 'subject_code': 'PH102', 'present': 30, 'total': 38,
+     'percentage': 0, 'faculty': 'Dr. Iyer', 'term': 'SEM 3'},
+    # Custom 60% threshold, matched on the subject name
+    {'subject': 'Chemistry Lab', 'subject_code': 'CHL103', 'present': 10, 'total': 20,
+     'percentage': 50.0, 'faculty': '', 'term': 'SEM 3'},
+    {'subject': 'Electronics', 'subject_code': 'EC104', 'present': 20, 'total': 40,
+     'percentage': 50.0, 'faculty': '', 'term': 'SEM 3'},
+    # No classes held yet; no faculty or term
+    {'subject': 'Seminar', 'subject_code': 'SEM105', 'present': 0, 'total': 0, 'percentage': 0},
+    # Exactly on the threshold
+    {'subject': 'English', 'subject_code': 'EN106', 'present': 30, 'total': 40, 'percentage': 75.0},
+]
+
+EXPECTED_SUBJECTS = [
+    {'subject': 'Mathematics', 'subject_code': 'MA101', 'present': 40, 'total': 45,
+     'percentage': 88.89, 'status': 'SAFE', 'threshold': 75.0, 'classes_needed': 0,
+     'classes_can_miss': 8, 'message': 'Safe! Can miss 8 more class(es)',
+     'faculty': 'Dr. Rao', 'term': 'SEM 3'},
+    {'subject': 'Physics', 'subject_code': 'PH102', 'present': 30, 'total': 38,
+     'percentage': 78.95, 'status': 'CRITICAL', 'threshold': 75.0, 'classes_needed': 0,
+     'classes_can_miss': 2, 'message': 'Critical! Can only miss 2 class(es)',
+     'faculty': 'Dr. Iyer', 'term': 'SEM 3'},
+    {'subject': 'Chemistry Lab', 'subject_code': 'CHL103', 'present': 10, 'total': 20,
+     'percentage': 50.0, 'status': 'LOW', 'threshold': 60, 'classes_needed': 5,
+     'classes_can_miss': 0, 'message': 'Low! Need to attend 5 consecutive class(es)',
+     'faculty': '', 'term': 'SEM 3'},
+    {'subject': 'Electronics', 'subject_code': 'EC104', 'present': 20, 'total': 40,
+     'percentage': 50.0, 'status': 'LOW', 'threshold': 75.0, 'classes_needed': 40,
+     'classes_can_miss': 0, 'message': 'Low! Need to attend 40 consecutive class(es)',
+     'faculty': '', 'term': 'SEM 3'},
+    {'subject': 'Seminar', 'subject_code': 'SEM105', 'present': 0, 'total': 0,
+     'percentage': 0, 'status': 'LOW', 'threshold': 75.0, 'classes_needed': 0,
+     'classes_can_miss': 0, 'message': 'Low! Need to attend 0 consecutive class(es)',
+     'faculty': '', 'term': ''},
+    {'subject': 'English', 'subject_code': 'EN106', 'present': 30, 'total': 40,
+     'percentage': 75.0, 'status': 'CRITICAL', 'threshold': 75.0, 'classes_needed': 0,
+     'classes_can_miss': 0, 'message': 'Critical! Can only miss 0 class(es)',
+     'faculty': '', 'term': ''},
+]
+
+EXPECTED_SUMMARY = {
+    'total_subjects': 6,
+    'safe_count': 1,
+    'critical_count': 2,
+    'low_count': 3,
+    'overall_present': 130,
+    'overall_total': 183,
+    'overall_percentage': 71.04,
+    'overall_status': 'LOW',
+}
+
+
+@pytest.fixture
+def calc():
+    return AttendanceCalculator(Thresholds(custom={'LAB': 60}))
+
+
+def test_analyze_all(calc):
+    analysis = calc.analyze_all(SUBJECTS)
+    assert analysis['subjects'] == EXPECTED_SUBJECTS
+    assert analysis['summary'] == EXPECTED_SUMMARY
+
+
+def test_analyze_all_matches_analyze_subject(calc):
+    analysis = calc.analyze_all(SUBJECTS)
+    assert analysis['subjects'] == [calc.analyze_subject(s).to_dict() for s in SUBJECTS]
+
+
+def test_analyze_all_empty(calc):
+    assert calc.analyze_all([]) == {
+        'subjects': [],
+        'summary': {
+            'total_subjects': 0,
+            'safe_count': 0,
+            'critical_count': 0,
+            'low_count': 0,
+            'overall_present': 0,
+            'overall_total': 0,
+            'overall_percentage': 0,
+            'overall_status': 'LOW',
+        },
+    }
+
+
+def test_get_priority_subjects(calc):
+    analysis = calc.analyze_all(SUBJECTS)
+    codes = [s['subject_code'] for s in calc.get_priority_subjects(analysis)]
+    # LOW before CRITICAL, lowest percentage first; ties keep input order
+    assert codes == ['SEM105', 'CHL103', 'EC104', 'EN106', 'PH102']
+
+
+def test_get_priority_subjects_top_n(calc):
+    analysis = calc.analyze_all(SUBJECTS)
+    codes = [s['subject_code'] for s in calc.get_priority_subjects(analysis, top_n=2)]
+    assert codes == ['SEM105', 'CHL103']
+
+
+@pytest.mark.parametrize('attended, conducted, threshold, needed, can_miss', [
+    (30, 40, 75, 0, 0),
+    (20, 40, 75, 40, 0),
+    (29, 40, 75, 4, 0),
+    (40, 45, 75, 0, 8),
+    (10, 20, 100, 0, 0),
+    (20, 20, 100, 0, 0),
+    (5, 10, 0, 0, 0),
+    (0, 0, 75, 0, 0),
+])
+def test_classes_needed_and_can_miss(calc, attended, conducted, threshold, needed, can_miss):
+    assert calc.calculate_classes_needed(attended, conducted, threshold) == needed
+    assert calc.calculate_classes_can_miss(attended, conducted, threshold) == can_miss
+
+
+@pytest.mark.parametrize('percentage, status', [
+    (85, Status.SAFE),
+    (84.99, Status.CRITICAL),
+    (75, Status.CRITICAL),
+    (74.99, Status.LOW),
+])
+def test_calculate_status(calc, percentage, status):
+    assert calc.calculate_status(percentage, 75) == status
@@ -0,0 +1,69 @@
+"""
+Tests for UniversalScraper's record processing.
+
+Expected rows are those the original per-record loop produced.
+"""
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from unitrack.core.config import Config
+from unitrack.core.scraper import UniversalScraper
+
+
+RECORDS = [
+    {'subject': 'Mathematics', 'subjectCode': 'MA101', 'presentCount': 40, 'absentCount': 5,
+     'facultName': ' Dr. Rao ', 'termName': 'SEM 3'},
+    {'subject': 'Physics', 'subjectCode': 'PH102', 'presentCount': '2', 'absentCount': '1',
+     'facultName': 'Dr. Iyer'},
+    {'subject': 'Seminar', 'subjectCode': 'SEM105', 'presentCount': 0, 'absentCount': 0},
+    {'subjectCode': 'EC104', 'presentCount': 7},
+]
+
+EXPECTED = [
+    {'subject': 'Mathematics', 'subject_code': 'MA101', 'present': 40, 'absent': 5,
+     'total': 45, 'percentage': 88.89, 'faculty': 'Dr. Rao', 'term': 'SEM 3'},
+    {'subject': 'Physics', 'subject_code': 'PH102', 'present': 2, 'absent': 1,
+     'total': 3, 'percentage': 66.67, 'faculty': 'Dr. Iyer', 'term': ''},
+    {'subject': 'Seminar', 'subject_code': 'SEM105', 'present': 0, 'absent': 0,
+     'total': 0, 'percentage': 0, 'faculty': '', 'term': ''},
+    {'subject': 'Unknown', 'subject_code': 'EC104', 'present': 7, 'absent': 0,
+     'total': 7, 'percentage': 100.0, 'faculty': '', 'term': ''},
+]
+
+
+def make_scraper(field_mappings=None):
+    config = Config()
+    if field_mappings is not None:
+        config.erp.field_mappings = field_mappings
+    return UniversalScraper(config)
+
+
+def test_process_attendance():
+    assert make_scraper()._process_attendance(RECORDS) == EXPECTED
+
+
+def test_process_attendance_skips_bad_records():
+    records = RECORDS[:2] + [
+        {'subject': 'Broken', 'presentCount': 'n/a'},
+        {'subject': 'No faculty', 'presentCount': 1, 'facultName': None},
+    ] + RECORDS[2:]
+    assert make_scraper()._process_attendance(records) == EXPECTED
+
+
+def test_process_attendance_field_mappings():
+    scraper = make_scraper({
+        'subject': 'name', 'subject_code': 'code', 'present': 'attended',
+        'absent': 'missed', 'faculty': 'teacher', 'term': 'sem',
+    })
+    records = [{'name': 'Biology', 'code': 'BI1', 'attended': 3, 'missed': 1,
+                'teacher': 'Ms. Das', 'sem': '2'}]
+    assert scraper._process_attendance(records) == [
+        {'subject': 'Biology', 'subject_code': 'BI1', 'present': 3, 'absent': 1,
+         'total': 4, 'percentage': 75.0, 'faculty': 'Ms. Das', 'term': '2'},
+    ]
+
+
+def test_process_attendance_empty():
+    assert make_scraper()._process_attendance([]) == []
@@ -14,11 +14,29 @@ from rich import print as rprint
 from ..core.config import (
     Config, load_config, save_config,
     Selectors, ERPConfig, Institution, Thresholds, Credentials,
-    CONFIG_FILE, get_data_path
+    CONFIG_FILE, get_data_path, load_data_file
 )
 
 console = Console()
 
+# `unitrack fetch` reuses attendance.json if it is newer than this
+FETCH_CACHE_TTL = 10 * 60
+
+STATUS_COLORS = {'SAFE': 'green', 'CRITICAL': 'yellow', 'LOW': 'red'}
+SUBJECT_NAME_WIDTH = 30
+
+
+def _default_action(subj):
+    if subj['classes_can_miss'] > 0:
+        return f"[green]Can miss {subj['classes_can_miss']}[/green]"
+    return "[yellow]Attend all[/yellow]"
+
+
+# "Action" column text for a subject, by status
+ACTION_FORMATS = {
+    'LOW': lambda subj: f"[red]Need {subj['classes_needed']}[/red]",
+}
+
 
 @click.group()
 @click.version_option(version="1.0.0", prog_name="UniTrack")
@@ -187,6 +205,7 @@ def setup():
 def fetch(refresh):
     """Fetch attendance data from ERP."""
     import os
+    import time
     config = load_config()
 
     # Check basic config (without password)
@@ -198,6 +217,20 @@ def fetch(refresh):
         console.print("[red]No username configured. Run 'unitrack setup' first.[/red]")
         return
 
+    # Skip the scrape if we fetched this account's data a few minutes ago
+    data_path = get_data_path('attendance.json')
+    if not refresh and data_path.exists():
+        try:
+            age = time.time() - data_path.stat().st_mtime
+            cached = load_data_file(data_path) if age < FETCH_CACHE_TTL else {}
+        except (ValueError, OSError):
+            # Unreadable or corrupt: treat it as stale and fetch again
+            cached = {}
+        if isinstance(cached, dict) and cached.get('source') == config.data_source():
+            console.print(f"[dim]Using cached attendance from {int(age // 60)} min ago "
+                          f"(use --refresh to fetch again)[/dim]")
+            return
+
     # Get password from env or prompt
     if not config.credentials.password:
         config.credentials.password = os.getenv("UNITRACK_PASSWORD", "")
@@ -229,9 +262,7 @@ def status():
         console.print("[yellow]No attendance data. Run 'unitrack fetch' first.[/yellow]")
         return
 
-    import json
-    with open(data_path) as f:
-        data = json.load(f)
+    data = load_data_file(data_path)
 
     subjects = data.get('subjects', [])
     if not subjects:
@@ -255,8 +286,7 @@ def status():
     console.print(f"\n[bold]Overall: {summary['overall_percentage']}%[/bold] "
                  f"({summary['overall_present']}/{summary['overall_total']} classes)")
 
-    status_colors = {'SAFE': 'green', 'CRITICAL': 'yellow', 'LOW': 'red'}
-    console.print(f"Status: [{status_colors[summary['overall_status']]}]{summary['overall_status']}[/]")
+    console.print(f"Status: [{STATUS_COLORS[summary['overall_status']]}]{summary['overall_status']}[/]")
 
     console.print(f"\n  [green]SAFE: {summary['safe_count']}[/green]  "
                  f"[yellow]CRITICAL: {summary['critical_count']}[/yellow]  "
@@ -271,23 +301,20 @@ def status():
     table.add_column("Status")
     table.add_column("Action")
 
+    add_row = table.add_row
     for subj in analysis['subjects']:
-        status_style = status_colors.get(subj['status'], 'white')
-
-        if subj['status'] == 'LOW':
-            action = f"[red]Need {subj['classes_needed']}[/red]"
-        elif subj['classes_can_miss'] > 0:
-            action = f"[green]Can miss {subj['classes_can_miss']}[/green]"
-        else:
-            action = "[yellow]Attend all[/yellow]"
+        status = subj['status']
+        name = subj['subject']
+        if len(name) > SUBJECT_NAME_WIDTH:
+            name = name[:SUBJECT_NAME_WIDTH] + "..."
 
-        table.add_row(
+        add_row(
             subj['subject_code'],
-            subj['subject'][:30] + "..." if len(subj['subject']) > 30 else subj['subject'],
+            name,
             f"{subj['present']}/{subj['total']}",
             f"{subj['percentage']}%",
-            f"[{status_style}]{subj['status']}[/]",
-            action
+            f"[{STATUS_COLORS.get(status, 'white')}]{status}[/]",
+            ACTION_FORMATS.get(status, _default_action)(subj)
         )
 
     console.print(table)
@@ -311,9 +338,8 @@ def serve(port, host):
     ))
 
     try:
-        from ..web.server import create_app
-        app = create_app(config)
-        app.run(host=host, port=port, debug=True)
+        from ..web.server import run_server
+        run_server(config, host=host, port=port)
     except ImportError:
         console.print("[red]Web module not available. Install with: pip install unitrack[web][/red]")
     except Exception as e:
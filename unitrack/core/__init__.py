@@ -1,9 +1,24 @@
 """Core modules for UniTrack."""
 
 from .config import Config, load_config, save_config
-from .scraper import UniversalScraper
-from .calculator import AttendanceCalculator
-from .discovery import ERPDiscovery
+
+# Imported on first access: scraper and discovery pull in Playwright, which
+# commands like `unitrack status` never need
+_LAZY_IMPORTS = {
+    "UniversalScraper": ".scraper",
+    "AttendanceCalculator": ".calculator",
+    "ERPDiscovery": ".discovery",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        from importlib import import_module
+        value = getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "Config",
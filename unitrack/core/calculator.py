@@ -4,8 +4,12 @@ Attendance Calculator Module
 Calculates attendance status, classes needed, and classes that can be missed.
 """
 
+import heapq
 import math
-from typing import Dict, List
+import sys
+from itertools import repeat
+from operator import itemgetter
+from typing import Dict, List, Tuple
 from dataclasses import dataclass
 
 from .config import Config, Thresholds
@@ -18,7 +22,15 @@ class Status:
     LOW = "LOW"            # Below threshold
 
 
-@dataclass
+# Status for each code returned by _status_code()
+STATUS_NAMES = (Status.LOW, Status.CRITICAL, Status.SAFE)
+
+
+# dataclass(slots=True) needs Python 3.10; older versions keep a __dict__
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_SLOTS)
 class SubjectAnalysis:
     """Analysis result for a single subject."""
     subject: str
@@ -52,6 +64,67 @@ class SubjectAnalysis:
         }
 
 
+@dataclass(**_SLOTS)
+class _SubjectColumns:
+    """Subject data as one list per field (see _to_columns)."""
+    subject: List[str]
+    subject_code: List[str]
+    present: List[int]
+    total: List[int]
+    percentage: List[float]
+    faculty: List[str]
+    term: List[str]
+
+
+def _to_columns(subjects: List[Dict]) -> _SubjectColumns:
+    """Read each field of every subject once, filling in missing percentages."""
+    present = [s.get('present', 0) for s in subjects]
+    total = [s.get('total', 0) for s in subjects]
+    return _SubjectColumns(
+        subject=[s.get('subject', 'Unknown') for s in subjects],
+        subject_code=[s.get('subject_code', '') for s in subjects],
+        present=present,
+        total=total,
+        percentage=[
+            (p / t) * 100 if pct == 0 and t > 0 else pct
+            for p, t, pct in zip(present, total, [s.get('percentage', 0) for s in subjects])
+        ],
+        faculty=[s.get('faculty', '') for s in subjects],
+        term=[s.get('term', '') for s in subjects],
+    )
+
+
+def _status_code(percentage: float, threshold: float, safe_buffer: float) -> int:
+    """Status as an index into STATUS_NAMES: 0 LOW, 1 CRITICAL, 2 SAFE."""
+    if percentage >= threshold + safe_buffer:
+        return 2
+    return int(percentage >= threshold)
+
+
+def _classes_needed(attended: int, conducted: int, threshold: float) -> int:
+    """x = ceil((threshold × conducted - attended) / (1 - threshold/100)), or 0."""
+    if conducted == 0:
+        return 0
+
+    threshold_decimal = threshold / 100
+    if attended / conducted >= threshold_decimal or threshold_decimal == 1:
+        return 0
+
+    return math.ceil((threshold_decimal * conducted - attended) / (1 - threshold_decimal))
+
+
+def _classes_can_miss(attended: int, conducted: int, threshold: float) -> int:
+    """y = floor((attended - threshold × conducted) / threshold), or 0."""
+    if conducted == 0:
+        return 0
+
+    threshold_decimal = threshold / 100
+    if attended / conducted < threshold_decimal or threshold_decimal == 0:
+        return 0
+
+    return math.floor((attended - threshold_decimal * conducted) / threshold_decimal)
+
+
 class AttendanceCalculator:
     """
     Calculator for attendance analysis.
@@ -80,14 +153,7 @@ class AttendanceCalculator:
         Returns:
             Status string: SAFE, CRITICAL, or LOW
         """
-        safe_threshold = threshold + self.thresholds.safe_buffer
-
-        if percentage >= safe_threshold:
-            return Status.SAFE
-        elif percentage >= threshold:
-            return Status.CRITICAL
-        else:
-            return Status.LOW
+        return STATUS_NAMES[_status_code(percentage, threshold, self.thresholds.safe_buffer)]
 
     def calculate_classes_needed(self, attended: int, conducted: int, threshold: float) -> int:
         """
@@ -103,22 +169,7 @@ class AttendanceCalculator:
         Returns:
             Number of consecutive classes needed (0 if already at threshold)
         """
-        if conducted == 0:
-            return 0
-
-        threshold_decimal = threshold / 100
-        current = attended / conducted
-
-        if current >= threshold_decimal:
-            return 0
-
-        numerator = threshold_decimal * conducted - attended
-        denominator = 1 - threshold_decimal
-
-        if denominator == 0:
-            return 0
-
-        return math.ceil(numerator / denominator)
+        return _classes_needed(attended, conducted, threshold)
 
     def calculate_classes_can_miss(self, attended: int, conducted: int, threshold: float) -> int:
         """
@@ -134,22 +185,17 @@ class AttendanceCalculator:
         Returns:
             Number of classes that can be missed (0 if below threshold)
         """
-        if conducted == 0:
-            return 0
+        return _classes_can_miss(attended, conducted, threshold)
 
-        threshold_decimal = threshold / 100
-        current = attended / conducted
-
-        if current < threshold_decimal:
-            return 0
-
-        numerator = attended - threshold_decimal * conducted
-        denominator = threshold_decimal
-
-        if denominator == 0:
-            return 0
-
-        return math.floor(numerator / denominator)
+    @staticmethod
+    def _status_message(status: str, classes_needed: int, classes_can_miss: int) -> str:
+        """Generate the advice message shown for a subject."""
+        if status == Status.SAFE:
+            return f"Safe! Can miss {classes_can_miss} more class(es)"
+        elif status == Status.CRITICAL:
+            return f"Critical! Can only miss {classes_can_miss} class(es)"
+        else:
+            return f"Low! Need to attend {classes_needed} consecutive class(es)"
 
     def analyze_subject(self, subject_data: Dict) -> SubjectAnalysis:
         """
@@ -179,14 +225,6 @@ class AttendanceCalculator:
         classes_needed = self.calculate_classes_needed(present, total, threshold)
         classes_can_miss = self.calculate_classes_can_miss(present, total, threshold)
 
-        # Generate message
-        if status == Status.SAFE:
-            message = f"Safe! Can miss {classes_can_miss} more class(es)"
-        elif status == Status.CRITICAL:
-            message = f"Critical! Can only miss {classes_can_miss} class(es)"
-        else:
-            message = f"Low! Need to attend {classes_needed} consecutive class(es)"
-
         return SubjectAnalysis(
             subject=subject,
             subject_code=subject_code,
@@ -197,11 +235,32 @@ class AttendanceCalculator:
             threshold=threshold,
             classes_needed=classes_needed,
             classes_can_miss=classes_can_miss,
-            message=message,
+            message=self._status_message(status, classes_needed, classes_can_miss),
             faculty=subject_data.get('faculty', ''),
             term=subject_data.get('term', ''),
         )
 
+    def _analyze_columns(self, present: List[int], total: List[int],
+                         thresholds: List[float]) -> Tuple[List[int], List[int]]:
+        """
+        Calculate classes needed and classes that can be missed for whole columns.
+
+        Maps the module-level formulas over the columns, with no per-subject
+        method calls.
+
+        Args:
+            present: Classes attended, one per subject
+            total: Classes conducted, one per subject
+            thresholds: Required percentage (0-100), one per subject
+
+        Returns:
+            (classes_needed, classes_can_miss) lists
+        """
+        return (
+            list(map(_classes_needed, present, total, thresholds)),
+            list(map(_classes_can_miss, present, total, thresholds)),
+        )
+
     def analyze_all(self, subjects: List[Dict]) -> Dict:
         """
         Analyze all subjects and provide summary.
@@ -212,26 +271,38 @@ class AttendanceCalculator:
         Returns:
             Dictionary with analysis results and summary
         """
-        analyzed = []
-        safe_count = 0
-        critical_count = 0
-        low_count = 0
-        total_present = 0
-        total_conducted = 0
-
-        for subject in subjects:
-            analysis = self.analyze_subject(subject)
-            analyzed.append(analysis.to_dict())
-
-            total_present += analysis.present
-            total_conducted += analysis.total
-
-            if analysis.status == Status.SAFE:
-                safe_count += 1
-            elif analysis.status == Status.CRITICAL:
-                critical_count += 1
-            else:
-                low_count += 1
+        cols = _to_columns(subjects)
+        thresholds = list(map(self.get_threshold, cols.subject_code, cols.subject))
+
+        status_codes = list(map(_status_code, cols.percentage, thresholds, repeat(self.thresholds.safe_buffer)))
+        statuses = [STATUS_NAMES[code] for code in status_codes]
+        needed, can_miss = self._analyze_columns(cols.present, cols.total, thresholds)
+
+        # Rows are only assembled at the end, straight from the columns
+        analyzed = [
+            {
+                'subject': name,
+                'subject_code': code,
+                'present': p,
+                'total': t,
+                'percentage': round(pct, 2),
+                'status': status,
+                'threshold': threshold,
+                'classes_needed': need,
+                'classes_can_miss': miss,
+                'message': self._status_message(status, need, miss),
+                'faculty': faculty,
+                'term': term,
+            }
+            for name, code, p, t, pct, status, threshold, need, miss, faculty, term in zip(
+                cols.subject, cols.subject_code, cols.present, cols.total, cols.percentage,
+                statuses, thresholds, needed, can_miss, cols.faculty, cols.term,
+            )
+        ]
+
+        low_count, critical_count, safe_count = map(status_codes.count, (0, 1, 2))
+        total_present = sum(cols.present)
+        total_conducted = sum(cols.total)
 
         # Overall stats
         overall_percentage = (total_present / total_conducted * 100) if total_conducted > 0 else 0
@@ -265,11 +336,8 @@ class AttendanceCalculator:
         subjects = analysis.get('subjects', [])
 
         # Sort by status (LOW first) then by percentage
-        status_priority = {Status.LOW: 0, Status.CRITICAL: 1, Status.SAFE: 2}
-
-        sorted_subjects = sorted(
-            subjects,
-            key=lambda x: (status_priority.get(x['status'], 2), x['percentage'])
-        )
+        status_priority = {Status.LOW: 0, Status.CRITICAL: 1, Status.SAFE: 2}.get
 
-        return sorted_subjects[:top_n]
+        # Keys are computed once per subject; only the top_n are fully ordered
+        keyed = [(status_priority(s['status'], 2), s['percentage'], s) for s in subjects]
+        return [s for _, _, s in heapq.nsmallest(top_n, keyed, key=itemgetter(0, 1))]
@@ -4,11 +4,19 @@ Configuration management for UniTrack.
 Handles loading, saving, and validating configuration from YAML files.
 """
 
+import hashlib
+import json
 import os
-import yaml
+import pickle
+import tempfile
 from pathlib import Path
-from dataclasses import dataclass, field, asdict
-from typing import Optional, Dict, List
+from dataclasses import dataclass, field, asdict, fields
+from typing import Optional, Dict, List, Union
+
+try:
+    import orjson  # Optional: faster data file loading (pip install unitrack[fast])
+except ImportError:
+    orjson = None
 
 
 # Default config directory
@@ -23,7 +31,7 @@ class Selectors:
     username_input: str = ""
     password_input: str = ""
     login_button: str = ""
-    attendance_trigger: str = ""  # Element to click to load attendance
+    attendance_trigger: Union[str, List[str]] = ""  # Element to click to load attendance (a list: one per term)
 
     def is_complete(self) -> bool:
         """Check if all required selectors are configured."""
@@ -41,15 +49,35 @@ class Thresholds:
     safe_buffer: float = 10.0  # Buffer above threshold for "safe" status
     custom: Dict[str, float] = field(default_factory=dict)  # Subject-specific thresholds
 
+    def __post_init__(self):
+        # Lookup cache; not a dataclass field, so it isn't saved to config
+        self._cache: Dict[tuple, float] = {}
+        self._cache_rules: Optional[tuple] = None  # (default, custom) it was built for
+        self._custom_upper: List[tuple] = []
+
     def get_threshold(self, subject_code: str = None, subject_name: str = None) -> float:
         """Get threshold for a subject, checking custom rules first."""
+        # Start over if the rules changed since the cache was filled
+        if self._cache_rules != (self.default, self.custom):
+            self._cache = {}
+            self._cache_rules = (self.default, dict(self.custom))
+            self._custom_upper = [(keyword.upper(), threshold) for keyword, threshold in self.custom.items()]
+
+        key = (subject_code or '', subject_name or '')
+        threshold = self._cache.get(key)
+        if threshold is None:
+            threshold = self._cache[key] = self._lookup_threshold(subject_code, subject_name)
+        return threshold
+
+    def _lookup_threshold(self, subject_code: str, subject_name: str) -> float:
         if subject_code and subject_code in self.custom:
             return self.custom[subject_code]
 
         # Check if subject name contains any custom threshold keywords
         if subject_name:
-            for keyword, threshold in self.custom.items():
-                if keyword.upper() in subject_name.upper():
+            name_upper = subject_name.upper()
+            for keyword, threshold in self._custom_upper:
+                if keyword in name_upper:
                     return threshold
 
         return self.default
@@ -118,6 +146,11 @@ class Config:
             self.credentials.password
         )
 
+    def data_source(self) -> str:
+        """Identify the ERP and account saved data came from (no secrets)."""
+        source = f"{self.erp.base_url}|{self.credentials.username}"
+        return hashlib.sha256(source.encode()).hexdigest()[:16]
+
     def to_dict(self) -> dict:
         """Convert config to dictionary (excluding sensitive data)."""
         data = asdict(self)
@@ -159,6 +192,22 @@ def ensure_config_dir():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def _yaml():
+    """
+    Import PyYAML on first use.
+
+    Returns:
+        (yaml module, Loader, Dumper), using the LibYAML C bindings when
+        PyYAML was built with them (same output, much faster)
+    """
+    import yaml
+    try:
+        from yaml import CSafeLoader as Loader, CSafeDumper as Dumper
+    except ImportError:
+        from yaml import SafeLoader as Loader, SafeDumper as Dumper
+    return yaml, Loader, Dumper
+
+
 def load_config(config_path: Path = None) -> Config:
     """
     Load configuration from YAML file.
@@ -177,14 +226,59 @@ def load_config(config_path: Path = None) -> Config:
     if not config_path.exists():
         return Config()
 
+    # Unchanged since last parse? Load the pickled Config instead
+    stat = config_path.stat()
+    cache_key = (stat.st_mtime_ns, stat.st_size, _config_schema())
+    cached = _read_config_cache(config_path, cache_key)
+    if cached is not None:
+        return cached
+
     try:
+        yaml, loader, _ = _yaml()
         with open(config_path, 'r') as f:
-            data = yaml.safe_load(f) or {}
-        return Config.from_dict(data)
+            data = yaml.load(f, Loader=loader) or {}
+        config = Config.from_dict(data)
     except Exception as e:
         print(f"Warning: Error loading config: {e}")
         return Config()
 
+    _write_config_cache(config_path, cache_key, config)
+    return config
+
+
+def _config_schema() -> tuple:
+    """Field names of the config dataclasses; a cache from older code won't match."""
+    return tuple(
+        (cls.__name__, tuple(f.name for f in fields(cls)))
+        for cls in (Config, Institution, ERPConfig, Selectors, Thresholds, Credentials)
+    )
+
+
+def _config_cache_path(config_path: Path) -> Path:
+    return config_path.with_suffix('.cache.pkl')
+
+
+def _read_config_cache(config_path: Path, cache_key: tuple) -> Optional[Config]:
+    """Return the cached Config if it was parsed from this exact file version."""
+    try:
+        with open(_config_cache_path(config_path), 'rb') as f:
+            key, config = pickle.load(f)
+    except Exception:
+        return None
+    return config if key == cache_key else None
+
+
+def _write_config_cache(config_path: Path, cache_key: tuple, config: Config):
+    """Pickle a parsed Config next to its YAML file (best effort, atomic)."""
+    cache_path = _config_cache_path(config_path)
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((cache_key, config), f, protocol=5)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
 
 def save_config(config: Config, config_path: Path = None):
     """
@@ -199,8 +293,9 @@ def save_config(config: Config, config_path: Path = None):
 
     ensure_config_dir()
 
+    yaml, _, dumper = _yaml()
     with open(config_path, 'w') as f:
-        yaml.dump(config.to_dict(), f, default_flow_style=False, sort_keys=False)
+        yaml.dump(config.to_dict(), f, Dumper=dumper, default_flow_style=False, sort_keys=False)
 
 
 def load_credentials() -> Credentials:
@@ -215,3 +310,29 @@ def get_data_path(filename: str) -> Path:
     """Get path to a data file."""
     ensure_config_dir()
     return DATA_DIR / filename
+
+
+def load_data_file(path: Path) -> dict:
+    """Load a JSON data file such as attendance.json."""
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_data_file(path: Path, data: dict):
+    """
+    Save a JSON data file such as attendance.json.
+
+    The JSON is compact, since only UniTrack reads these files. Writes to a
+    temp file and swaps it in, so readers never see a half-written file.
+    """
+    if orjson is not None:
+        body = orjson.dumps(data, default=str)
+    else:
+        body = json.dumps(data, separators=(',', ':'), default=str).encode()
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, path)
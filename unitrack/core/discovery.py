@@ -5,11 +5,13 @@ Automatically discovers login selectors and attendance API endpoints
 for any university ERP system.
 """
 
-from playwright.sync_api import Page, Response
-from typing import Optional, Dict, List, Tuple
-import json
+from typing import TYPE_CHECKING, Optional, Dict, List, Tuple
 import re
 
+if TYPE_CHECKING:
+    # Only for annotations; the page passed in brings Playwright with it
+    from playwright.sync_api import Page, Response
+
 
 class ERPDiscovery:
     """
@@ -70,11 +72,53 @@ class ERPDiscovery:
         r'api.*attendance',
         r'marks.*attendance',
     ]
-
-    def __init__(self, page: Page):
+    # Attendance-related words in record keys (lowercase)
+    ATTENDANCE_KEYS = frozenset({
+        'present', 'absent', 'attendance', 'attended',
+        'presentcount', 'absentcount', 'totalclasses',
+        'subject', 'subjectcode', 'course', 'faculty',
+        'percentage', 'percent',
+    })
+    # Attendance lists are small; skip bigger responses without reading them
+    MAX_RESPONSE_BYTES = 2_000_000
+    # All of the API patterns as one pattern, compiled once
+    _API_RE = re.compile('|'.join(f'(?:{p})' for p in ATTENDANCE_API_PATTERNS), re.IGNORECASE)
+
+    # For each field, whether each pattern's first match is visible: true or
+    # false, or null when the browser can't parse it (Playwright-only syntax)
+    _PROBE_SELECTORS_JS = """(fields) => {
+        const visible = (el) => !!el && el.getClientRects().length > 0
+            && getComputedStyle(el).visibility !== 'hidden';
+        const result = {};
+        for (const [field, patterns] of Object.entries(fields)) {
+            result[field] = patterns.map((pattern) => {
+                try {
+                    return visible(document.querySelector(pattern));
+                } catch (e) {
+                    return null;
+                }
+            });
+        }
+        return result;
+    }"""
+
+    # Our field -> substrings of API keys that map to it, best first
+    FIELD_PATTERNS = {
+        'subject': ('subject', 'subjectname', 'coursename', 'course'),
+        'subject_code': ('subjectcode', 'coursecode', 'code', 'subcode'),
+        'present': ('present', 'presentcount', 'attended', 'attendedclasses'),
+        'absent': ('absent', 'absentcount', 'missed', 'missedclasses'),
+        'total': ('total', 'totalclasses', 'conducted', 'session', 'classes'),
+        'percentage': ('percentage', 'percent', 'attendanceper', 'attendancepercent'),
+        'faculty': ('faculty', 'facultname', 'teacher', 'instructor', 'facultyname'),
+        'term': ('term', 'termname', 'semester', 'sem'),
+    }
+
+    def __init__(self, page: "Page"):
         """Initialize discovery with a Playwright page."""
         self.page = page
         self._discovered_apis: List[Dict] = []
+        self._shape_verdicts: Dict[frozenset, bool] = {}
 
     def discover_login_selectors(self, url: str) -> Dict[str, str]:
         """
@@ -95,48 +139,33 @@ class ERPDiscovery:
         self.page.goto(url)
         self.page.wait_for_load_state("networkidle")
 
-        selectors = {
-            "username_input": "",
-            "password_input": "",
-            "login_button": "",
+        # Probe every pattern in one page.evaluate instead of three CDP
+        # calls per pattern
+        candidates = {
+            "username_input": self.USERNAME_PATTERNS,
+            "password_input": self.PASSWORD_PATTERNS,
+            "login_button": self.LOGIN_BUTTON_PATTERNS,
         }
-
-        # Find username field
-        for pattern in self.USERNAME_PATTERNS:
-            try:
-                if self.page.locator(pattern).count() > 0:
-                    # Verify it's visible and enabled
-                    elem = self.page.locator(pattern).first
-                    if elem.is_visible():
-                        selectors["username_input"] = pattern
-                        print(f"  Found username: {pattern}")
-                        break
-            except:
-                continue
-
-        # Find password field
-        for pattern in self.PASSWORD_PATTERNS:
-            try:
-                if self.page.locator(pattern).count() > 0:
-                    elem = self.page.locator(pattern).first
-                    if elem.is_visible():
-                        selectors["password_input"] = pattern
-                        print(f"  Found password: {pattern}")
-                        break
-            except:
-                continue
-
-        # Find login button
-        for pattern in self.LOGIN_BUTTON_PATTERNS:
-            try:
-                if self.page.locator(pattern).count() > 0:
-                    elem = self.page.locator(pattern).first
-                    if elem.is_visible():
-                        selectors["login_button"] = pattern
-                        print(f"  Found login button: {pattern}")
-                        break
-            except:
-                continue
+        try:
+            probed = self.page.evaluate(self._PROBE_SELECTORS_JS, candidates)
+        except Exception:
+            probed = {field: [None] * len(patterns) for field, patterns in candidates.items()}
+
+        selectors = {}
+        for field, patterns in candidates.items():
+            selectors[field] = ""
+            for pattern, visible in zip(patterns, probed[field]):
+                if visible is None:
+                    # Playwright-only syntax (e.g. :has-text); ask Playwright
+                    try:
+                        elem = self.page.locator(pattern)
+                        visible = elem.count() > 0 and elem.first.is_visible()
+                    except Exception:
+                        visible = False
+                if visible:
+                    selectors[field] = pattern
+                    print(f"  Found {field}: {pattern}")
+                    break
 
         return selectors
 
@@ -159,32 +188,36 @@ class ERPDiscovery:
         """
         print("Discovering attendance API...")
 
-        # Set up response listener
-        captured_responses: List[Dict] = []
+        # Set up response listener; keeps only the largest payload seen
+        best_url: Optional[str] = None
+        best_data: List[Dict] = []
 
-        def capture_response(response: Response):
+        def capture_response(response: "Response"):
             """Capture potential attendance API responses."""
+            nonlocal best_url, best_data
             url = response.url.lower()
 
             # Check if URL matches attendance patterns
-            for pattern in self.ATTENDANCE_API_PATTERNS:
-                if re.search(pattern, url, re.IGNORECASE):
-                    try:
-                        if response.status == 200:
-                            content_type = response.headers.get('content-type', '')
-                            if 'json' in content_type or url.endswith('.json'):
-                                body = response.text()
-                                data = json.loads(body)
-
-                                # Check if it looks like attendance data
-                                if self._looks_like_attendance(data):
-                                    captured_responses.append({
-                                        "url": response.url,
-                                        "data": data,
-                                    })
-                                    print(f"  Captured potential attendance API: {response.url}")
-                    except:
-                        pass
+            if not self._API_RE.search(url):
+                return
+
+            try:
+                if response.status == 200:
+                    headers = response.headers
+                    content_type = headers.get('content-type', '')
+                    # Decide from headers before the body crosses CDP
+                    if int(headers.get('content-length') or 0) > self.MAX_RESPONSE_BYTES:
+                        return
+                    if 'json' in content_type or url.endswith('.json'):
+                        data = response.json()
+
+                        # Check if it looks like attendance data
+                        if self._looks_like_attendance(data):
+                            print(f"  Captured potential attendance API: {response.url}")
+                            if len(data) > len(best_data):
+                                best_url, best_data = response.url, data
+            except Exception:
+                pass
 
         self.page.on("response", capture_response)
 
@@ -225,15 +258,14 @@ class ERPDiscovery:
                         elem.first.click()
                         self.page.wait_for_timeout(3000)
 
-                        if captured_responses:
+                        if best_url:
                             break
                 except:
                     continue
 
             # Return the best match
-            if captured_responses:
-                best_match = max(captured_responses, key=lambda x: len(x['data']))
-                return best_match['url'], best_match['data']
+            if best_url:
+                return best_url, best_data
 
             return None, []
 
@@ -245,22 +277,26 @@ class ERPDiscovery:
         if isinstance(data, list) and len(data) > 0:
             first_item = data[0]
             if isinstance(first_item, dict):
-                # Check for attendance-related keys
-                attendance_keys = [
-                    'present', 'absent', 'attendance', 'attended',
-                    'presentCount', 'absentCount', 'totalClasses',
-                    'subject', 'subjectCode', 'course', 'faculty',
-                    'percentage', 'percent',
-                ]
-                item_keys = [k.lower() for k in first_item.keys()]
-
-                matches = sum(1 for key in attendance_keys
-                             if any(key.lower() in k for k in item_keys))
+                item_keys = frozenset(k.lower() for k in first_item.keys())
 
-                return matches >= 2
+                # Responses from the same endpoint share a shape
+                verdict = self._shape_verdicts.get(item_keys)
+                if verdict is None:
+                    verdict = self._shape_verdicts[item_keys] = self._keys_look_like_attendance(item_keys)
+                return verdict
 
         return False
 
+    def _keys_look_like_attendance(self, item_keys: frozenset) -> bool:
+        """At least two attendance-related words appear in the record's (lowercased) keys."""
+        # Exact key matches are the common case
+        if len(item_keys & self.ATTENDANCE_KEYS) >= 2:
+            return True
+
+        matches = sum(1 for key in self.ATTENDANCE_KEYS
+                      if any(key in k for k in item_keys))
+        return matches >= 2
+
     def discover_field_mappings(self, sample_data: List[Dict]) -> Dict[str, str]:
         """
         Discover field mappings from sample attendance data.
@@ -274,31 +310,19 @@ class ERPDiscovery:
         if not sample_data:
             return {}
 
-        sample = sample_data[0]
-        mappings = {}
+        # Lowercase each key once: (lowered, original)
+        sample_keys = list({k.lower(): k for k in sample_data[0].keys()}.items())
 
-        # Field patterns to look for
-        field_patterns = {
-            'subject': ['subject', 'subjectname', 'coursename', 'course'],
-            'subject_code': ['subjectcode', 'coursecode', 'code', 'subcode'],
-            'present': ['present', 'presentcount', 'attended', 'attendedclasses'],
-            'absent': ['absent', 'absentcount', 'missed', 'missedclasses'],
-            'total': ['total', 'totalclasses', 'conducted', 'session', 'classes'],
-            'percentage': ['percentage', 'percent', 'attendanceper', 'attendancepercent'],
-            'faculty': ['faculty', 'facultname', 'teacher', 'instructor', 'facultyname'],
-            'term': ['term', 'termname', 'semester', 'sem'],
-        }
-
-        sample_keys = {k.lower(): k for k in sample.keys()}
-
-        for our_field, patterns in field_patterns.items():
-            for pattern in patterns:
-                for key_lower, key_original in sample_keys.items():
-                    if pattern in key_lower:
-                        mappings[our_field] = key_original
-                        break
-                if our_field in mappings:
-                    break
+        mappings = {}
+        for our_field, patterns in self.FIELD_PATTERNS.items():
+            # First pattern (in priority order) found in any key
+            match = next(
+                (key_original for pattern in patterns
+                 for key_lower, key_original in sample_keys if pattern in key_lower),
+                None,
+            )
+            if match is not None:
+                mappings[our_field] = match
 
         return mappings
 
@@ -4,11 +4,148 @@ Universal Scraper Module
 Scrapes attendance data from any configured ERP system.
 """
 
-from playwright.sync_api import sync_playwright, Page, Response, Browser
-from typing import Optional, List, Dict
+from playwright.sync_api import sync_playwright, Page, Response, Browser, BrowserContext
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from typing import Optional, List, Dict, Iterator
+from io import BytesIO
+from types import SimpleNamespace
+import atexit
 import json
+import operator
+import queue
+import threading
 
-from .config import Config, get_data_path
+try:
+    import orjson  # Optional: faster response parsing (pip install unitrack[fast])
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # Optional: stream-parse large responses
+except ImportError:
+    ijson = None
+
+from .config import Config, get_data_path, save_data_file
+
+
+# Parses raw response bytes; orjson reads them without decoding to str first
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _percentage(present: int, total: int) -> float:
+    """Attendance percentage rounded to 2 places (0 with no classes)."""
+    return round(present / total * 100, 2) if total > 0 else 0
+
+
+# How long (ms) to wait for the dashboard after login, and for the
+# attendance API to answer the trigger click
+LOGIN_TIMEOUT = 10_000
+ATTENDANCE_TIMEOUT = 15_000
+
+# URL fragments of a login page's error variant
+LOGIN_FAILURE_MARKERS = ('login', 'error', 'authfailed')
+
+# Tried in order when no attendance trigger is configured
+COMMON_TRIGGERS = ["#stud2", "text=Attendance", "[href*='attendance']"]
+
+# Whether each selector's first match is visible: true or false, or null
+# when the browser can't parse it (Playwright-only syntax like text=)
+_VISIBLE_SELECTORS_JS = """(selectors) => selectors.map((selector) => {
+    try {
+        const el = document.querySelector(selector);
+        return !!el && el.getClientRects().length > 0
+            && getComputedStyle(el).visibility !== 'hidden';
+    } catch (e) {
+        return null;
+    }
+})"""
+
+# Words in record keys that mark attendance data
+ATTENDANCE_KEYWORDS = ('present', 'absent', 'subject', 'attendance', 'faculty')
+
+# Verdict per record shape (lowercased key set), shared by all scrapes
+_shape_verdicts: Dict[frozenset, bool] = {}
+
+# Bodies larger than this (by Content-Length) are never read
+MAX_CAPTURE_BYTES = 50_000_000
+
+# Content types that can't hold the attendance JSON
+NON_JSON_TYPES = ('text/html', 'text/css', 'image/', 'font/', 'video/', 'audio/')
+
+# Responses bigger than this are streamed record by record when ijson is
+# installed; below it, one full parse is faster
+STREAM_PARSE_BYTES = 1_000_000
+
+
+def _may_be_json(response: Response) -> bool:
+    """Decide from the headers alone whether the body is worth parsing."""
+    headers = response.headers
+    if int(headers.get('content-length') or 0) > MAX_CAPTURE_BYTES:
+        return False
+    # Some ERPs send JSON as text/plain or with no type, so only rule out
+    # types that are clearly something else (e.g. HTML error pages)
+    return not headers.get('content-type', '').startswith(NON_JSON_TYPES)
+
+
+def _iter_records(body: bytes) -> Iterator:
+    """Yield the items of a top-level JSON array (nothing for other JSON)."""
+    if ijson is not None and len(body) > STREAM_PARSE_BYTES:
+        return ijson.items(BytesIO(body), 'item', use_float=True)
+    data = _loads(body)
+    return iter(data if isinstance(data, list) else ())
+
+
+class _BrowserPool:
+    """
+    Keeps Chromium running between scrapes.
+
+    Sync Playwright objects only work on the thread that created them, so
+    each thread gets its own browser, launched on first use. Every scrape
+    gets a fresh context; only the context is closed afterwards.
+    """
+
+    _local = threading.local()
+
+    @classmethod
+    def browser(cls, headless: bool) -> Browser:
+        """Get this thread's browser, launching (or relaunching) it if needed."""
+        local = cls._local
+        if getattr(local, 'playwright', None) is None:
+            local.playwright = sync_playwright().start()
+            local.browsers = {}
+
+        browser = local.browsers.get(headless)
+        if browser is None or not browser.is_connected():
+            browser = local.browsers[headless] = local.playwright.chromium.launch(
+                headless=headless
+            )
+        return browser
+
+    @classmethod
+    def shutdown(cls):
+        """
+        Stop the calling thread's Playwright driver (and its browsers).
+
+        Run at exit on the main thread, this covers the CLI, which scrapes
+        on the main thread. Other threads' drivers can't be stopped from
+        here, since their objects are bound to those threads; they end with
+        the process.
+        """
+        playwright = getattr(cls._local, 'playwright', None)
+        if playwright is not None:
+            cls._local.playwright = None
+            try:
+                playwright.stop()
+            except Exception:
+                pass
+
+
+atexit.register(_BrowserPool.shutdown)
+
+
+def warm_up(headless: bool = False):
+    """Launch the calling thread's browser ahead of the first scrape."""
+    _BrowserPool.browser(headless)
 
 
 class UniversalScraper:
@@ -24,27 +161,33 @@ class UniversalScraper:
     def __init__(self, config: Config):
         """Initialize scraper with configuration."""
         self.config = config
-        self._browser: Optional[Browser] = None
+        # The ERP settings a scrape reads, flattened once
+        erp = config.erp
+        self._erp = SimpleNamespace(
+            login_url=erp.login_url or erp.base_url,
+            username_input=erp.selectors.username_input,
+            password_input=erp.selectors.password_input,
+            login_button=erp.selectors.login_button,
+            attendance_trigger=erp.selectors.attendance_trigger,
+            attendance_api=erp.attendance_api,
+            field_mappings=erp.field_mappings,
+        )
+        self._context: Optional[BrowserContext] = None
         self._page: Optional[Page] = None
-        self._playwright = None
         self._is_logged_in = False
         self._captured_data: List[Dict] = []
 
     def __enter__(self):
         """Context manager entry."""
-        self._playwright = sync_playwright().start()
-        self._browser = self._playwright.chromium.launch(
-            headless=self.config.headless
-        )
-        self._page = self._browser.new_page()
+        browser = _BrowserPool.browser(self.config.headless)
+        self._context = browser.new_context()
+        self._page = self._context.new_page()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit."""
-        if self._browser:
-            self._browser.close()
-        if self._playwright:
-            self._playwright.stop()
+        """Context manager exit. The browser stays up for the next scrape."""
+        if self._context:
+            self._context.close()
 
     @property
     def page(self) -> Page:
@@ -61,7 +204,7 @@ class UniversalScraper:
             True if login successful, False otherwise
         """
         config = self.config
-        selectors = config.erp.selectors
+        erp = self._erp
 
         if not config.credentials.username or not config.credentials.password:
             print("Error: Credentials not configured!")
@@ -71,21 +214,26 @@ class UniversalScraper:
 
         try:
             # Navigate to login page
-            login_url = config.erp.login_url or config.erp.base_url
-            self.page.goto(login_url)
-            self.page.wait_for_load_state("networkidle")
+            self.page.goto(erp.login_url, wait_until="domcontentloaded")
 
-            # Fill credentials
-            self.page.fill(selectors.username_input, config.credentials.username)
-            self.page.fill(selectors.password_input, config.credentials.password)
+            # Fill credentials (fill waits for the inputs to appear)
+            self.page.fill(erp.username_input, config.credentials.username)
+            self.page.fill(erp.password_input, config.credentials.password)
 
-            # Click login
-            self.page.click(selectors.login_button)
-            self.page.wait_for_load_state("networkidle")
-            self.page.wait_for_timeout(2000)
-
-            # Check if still on login page
-            if "login" in self.page.url.lower():
+            # Click login and wait for the page it leads to. The login form
+            # may live at the base URL, so the URL alone proves nothing yet
+            try:
+                with self.page.expect_navigation(
+                    wait_until="domcontentloaded", timeout=LOGIN_TIMEOUT
+                ):
+                    self.page.click(erp.login_button)
+            except PlaywrightTimeoutError:
+                pass  # No navigation (e.g. an in-page error); checked below
+
+            # Check if still on (or back at) the login page
+            url = self.page.url.lower()
+            if (any(marker in url for marker in LOGIN_FAILURE_MARKERS)
+                    or self.page.locator(erp.password_input).first.is_visible()):
                 print("Login failed - still on login page")
                 return False
 
@@ -110,62 +258,167 @@ class UniversalScraper:
 
         print("Fetching attendance data...")
 
-        config = self.config
+        api = self._erp.attendance_api
         captured_data = []
+        # Matching responses wait here; their bodies are read in collect(),
+        # so Playwright's event dispatch never blocks on a download or parse
+        pending = queue.SimpleQueue()
 
         def capture_response(response: Response):
-            """Capture attendance API response."""
-            # Check if this is the attendance API
-            if config.erp.attendance_api:
-                if config.erp.attendance_api in response.url:
+            """Queue a likely attendance response."""
+            # Everything here is decided from the URL and request metadata
+            if response.status != 200 or not _may_be_json(response):
+                return
+            if api:
+                # Check if this is the attendance API
+                if api in response.url:
+                    pending.put(response)
+            elif (response.request.resource_type in ('xhr', 'fetch')
+                    and '.json' in response.url.lower()):
+                # Might be attendance; collect() checks the shape
+                pending.put(response)
+
+        def collect() -> int:
+            """Parse queued responses; returns how many yielded records."""
+            answered = 0
+            while not pending.empty():
+                response = pending.get()
+                before = len(captured_data)
+                if api:
                     try:
-                        if response.status == 200:
-                            body = response.text()
-                            data = json.loads(body)
-                            if isinstance(data, list):
-                                captured_data.extend(data)
-                            print(f"  Captured {len(data)} records from API")
+                        captured_data.extend(_iter_records(response.body()))
+                        print(f"  Captured {len(captured_data) - before} records from API")
                     except Exception as e:
                         print(f"  Error capturing response: {e}")
-            else:
-                # Try to capture any JSON that looks like attendance
-                try:
-                    if response.status == 200 and '.json' in response.url.lower():
-                        body = response.text()
-                        data = json.loads(body)
-                        if self._looks_like_attendance(data):
-                            if isinstance(data, list):
-                                captured_data.extend(data)
-                            print(f"  Captured {len(data)} records")
-                except:
-                    pass
+                else:
+                    # Try to capture any JSON that looks like attendance
+                    try:
+                        # Judge the shape from the first record before reading the rest
+                        records = _iter_records(response.body())
+                        first = next(records, None)
+                        if self._looks_like_attendance([first]):
+                            captured_data.append(first)
+                            captured_data.extend(records)
+                            print(f"  Captured {len(captured_data) - before} records")
+                    except Exception:
+                        pass
+                answered += len(captured_data) > before
+            return answered
+
+        trigger_selector = self._erp.attendance_trigger
+        if isinstance(trigger_selector, list):
+            if len(trigger_selector) > 1:
+                self._fetch_terms(trigger_selector, capture_response, collect)
+                return self._finish_fetch(captured_data)
+            trigger_selector = trigger_selector[0] if trigger_selector else ""
+
+        if trigger_selector and api:
+            # Known trigger and endpoint: wait for exactly that response
+            # instead of sleeping
+            trigger = self.page.locator(trigger_selector).first
+            try:
+                trigger.wait_for(state="visible", timeout=LOGIN_TIMEOUT)
+                with self.page.expect_response(
+                    lambda r: api in r.url and r.status == 200,
+                    timeout=ATTENDANCE_TIMEOUT,
+                ) as response_info:
+                    trigger.click()
+                capture_response(response_info.value)
+                collect()
+            except PlaywrightTimeoutError:
+                print("  Timed out waiting for the attendance trigger or API")
+            return self._finish_fetch(captured_data)
 
         self.page.on("response", capture_response)
 
         try:
             # Click attendance trigger if configured
-            if config.erp.selectors.attendance_trigger:
-                trigger = self.page.locator(config.erp.selectors.attendance_trigger)
+            if trigger_selector:
+                trigger = self.page.locator(trigger_selector)
                 if trigger.count() > 0:
                     trigger.first.click()
-                    self.page.wait_for_timeout(5000)
+                    # Move on as soon as something is captured (up to 5 s)
+                    for _ in range(50):
+                        self.page.wait_for_timeout(100)
+                        if collect():
+                            break
             else:
-                # Try common triggers
-                triggers = ["#stud2", "text=Attendance", "[href*='attendance']"]
-                for t in triggers:
-                    try:
-                        elem = self.page.locator(t)
-                        if elem.count() > 0 and elem.first.is_visible():
-                            elem.first.click()
-                            self.page.wait_for_timeout(3000)
-                            if captured_data:
-                                break
-                    except:
+                # Try common triggers, checking them all in one evaluate
+                try:
+                    probed = self.page.evaluate(_VISIBLE_SELECTORS_JS, COMMON_TRIGGERS)
+                except Exception:
+                    probed = [None] * len(COMMON_TRIGGERS)
+
+                for t, visible in zip(COMMON_TRIGGERS, probed):
+                    elem = self.page.locator(t).first
+                    if visible is None:
+                        # Only Playwright understands this selector
+                        visible = elem.is_visible()
+                    if not visible:
                         continue
+                    elem.click()
+                    # Move on as soon as something is captured (up to 3 s)
+                    for _ in range(30):
+                        self.page.wait_for_timeout(100)
+                        if collect():
+                            break
+                    if captured_data:
+                        break
 
         finally:
             self.page.remove_listener("response", capture_response)
 
+        collect()
+        return self._finish_fetch(captured_data)
+
+    def _fetch_terms(self, triggers: List[str], capture_response, collect):
+        """
+        Load several terms at once, one tab per trigger.
+
+        The tabs share the logged-in context, so all clicks go out back to
+        back and the responses load in parallel: the wait is for the slowest
+        term, not the sum of them.
+
+        Args:
+            triggers: Element to click for each term
+            capture_response: Response handler from fetch_attendance
+            collect: Parses queued responses, returning how many had records
+        """
+        context = self._context
+        dashboard_url = self.page.url
+        pages = [self.page] + [context.new_page() for _ in triggers[1:]]
+
+        try:
+            for page in pages[1:]:
+                page.goto(dashboard_url, wait_until="domcontentloaded")
+
+            # Listen only once the tabs have loaded, so the dashboard's own
+            # JSON requests aren't queued and counted as answered terms
+            context.on("response", capture_response)
+            try:
+                for page, trigger in zip(pages, triggers):
+                    try:
+                        page.locator(trigger).first.click(timeout=LOGIN_TIMEOUT)
+                    except PlaywrightTimeoutError:
+                        print(f"  Trigger not found: {trigger}")
+
+                # Wait until every term has answered (or time runs out)
+                answered = 0
+                for _ in range(ATTENDANCE_TIMEOUT // 100):
+                    answered += collect()
+                    if answered >= len(triggers):
+                        break
+                    self.page.wait_for_timeout(100)
+                # Bodies must be read before their tabs close
+                collect()
+            finally:
+                context.remove_listener("response", capture_response)
+        finally:
+            for page in pages[1:]:
+                page.close()
+
+    def _finish_fetch(self, captured_data: List[Dict]) -> List[Dict]:
+        """Process and save the captured records."""
         # Process captured data
         if captured_data:
             processed = self._process_attendance(captured_data)
@@ -180,9 +433,14 @@ class UniversalScraper:
         if isinstance(data, list) and len(data) > 0:
             first = data[0]
             if isinstance(first, dict):
-                keys = [k.lower() for k in first.keys()]
-                attendance_keywords = ['present', 'absent', 'subject', 'attendance', 'faculty']
-                return sum(1 for k in attendance_keywords if any(k in key for key in keys)) >= 2
+                keys = frozenset(k.lower() for k in first.keys())
+                # Responses from the same endpoint share a shape
+                verdict = _shape_verdicts.get(keys)
+                if verdict is None:
+                    verdict = _shape_verdicts[keys] = sum(
+                        1 for k in ATTENDANCE_KEYWORDS if any(k in key for key in keys)
+                    ) >= 2
+                return verdict
         return False
 
     def _process_attendance(self, raw_data: List[Dict]) -> List[Dict]:
@@ -195,31 +453,52 @@ class UniversalScraper:
         Returns:
             Processed attendance records
         """
-        mappings = self.config.erp.field_mappings
+        mappings = self._erp.field_mappings
+        # Resolve each field's API key once, not per record
+        present_key = mappings.get('present', 'presentCount')
+        absent_key = mappings.get('absent', 'absentCount')
+        subject_key = mappings.get('subject', 'subject')
+        code_key = mappings.get('subject_code', 'subjectCode')
+        faculty_key = mappings.get('faculty', 'facultName')
+        term_key = mappings.get('term', 'termName')
+
+        def row(item: Dict, present: int, absent: int, total: int, percentage: float) -> Dict:
+            get = item.get
+            return {
+                'subject': get(subject_key, 'Unknown'),
+                'subject_code': get(code_key, ''),
+                'present': present,
+                'absent': absent,
+                'total': total,
+                'percentage': percentage,
+                'faculty': get(faculty_key, '').strip(),
+                'term': get(term_key, ''),
+            }
+
+        def process(item: Dict) -> Dict:
+            present = int(item.get(present_key, 0))
+            absent = int(item.get(absent_key, 0))
+            # Calculate total (present + absent is more accurate than 'total' field)
+            total = present + absent
+            return row(item, present, absent, total, _percentage(present, total))
+
+        # Fast path: every record is well-formed. The counts are pulled out
+        # as columns and the arithmetic is mapped over them in one pass each
+        try:
+            present = [int(item.get(present_key, 0)) for item in raw_data]
+            absent = [int(item.get(absent_key, 0)) for item in raw_data]
+            total = list(map(operator.add, present, absent))
+            return list(map(
+                row, raw_data, present, absent, total, map(_percentage, present, total)
+            ))
+        except Exception:
+            pass
+
+        # Slow path: skip just the records that fail
         processed = []
-
         for item in raw_data:
             try:
-                # Get values using mappings
-                present = int(item.get(mappings.get('present', 'presentCount'), 0))
-                absent = int(item.get(mappings.get('absent', 'absentCount'), 0))
-
-                # Calculate total (present + absent is more accurate than 'total' field)
-                total = present + absent
-
-                # Calculate percentage
-                percentage = (present / total * 100) if total > 0 else 0
-
-                processed.append({
-                    'subject': item.get(mappings.get('subject', 'subject'), 'Unknown'),
-                    'subject_code': item.get(mappings.get('subject_code', 'subjectCode'), ''),
-                    'present': present,
-                    'absent': absent,
-                    'total': total,
-                    'percentage': round(percentage, 2),
-                    'faculty': item.get(mappings.get('faculty', 'facultName'), '').strip(),
-                    'term': item.get(mappings.get('term', 'termName'), ''),
-                })
+                processed.append(process(item))
             except Exception as e:
                 print(f"  Warning: Error processing record: {e}")
                 continue
@@ -233,12 +512,12 @@ class UniversalScraper:
         save_data = {
             'timestamp': datetime.now().isoformat(),
             'institution': self.config.institution.name,
+            'source': self.config.data_source(),
             'subjects': data,
         }
 
         filepath = get_data_path('attendance.json')
-        with open(filepath, 'w') as f:
-            json.dump(save_data, f, indent=2)
+        save_data_file(filepath, save_data)
 
         print(f"  Saved to {filepath}")
 
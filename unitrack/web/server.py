@@ -4,16 +4,39 @@ UniTrack Web Server
 Flask API server for the web dashboard.
 """
 
-import json
+import gzip
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, jsonify, request, send_from_directory
+from functools import lru_cache
+from flask import Flask, request, send_from_directory
 from flask_cors import CORS
 from pathlib import Path
+from typing import Optional
 
-from ..core.config import Config, load_config, get_data_path
+from ..core.config import Config, load_config, get_data_path, load_data_file, orjson
 from ..core.calculator import AttendanceCalculator
 
 
+STATIC_FOLDER = Path(__file__).parent / 'static'
+
+# Browser cache lifetimes (seconds): the page itself, and the build's
+# content-hashed assets, which never change under the same name
+INDEX_MAX_AGE = 60 * 60
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+# JSON responses at least this big are gzipped for clients that accept it
+COMPRESS_MIN_SIZE = 1024
+
+
+@lru_cache(maxsize=16)
+def _gzip(body: bytes) -> bytes:
+    # Most bodies are the cached ones, so repeat polls skip compression
+    return gzip.compress(body, compresslevel=6)
+
+
 def create_app(config: Config = None) -> Flask:
     """
     Create Flask application.
@@ -32,16 +55,76 @@ def create_app(config: Config = None) -> Flask:
 
     # Store config in app context
     app.config['UNITRACK_CONFIG'] = config
+    # The calculator keeps no per-call state, so requests share one
+    calc = app.config['UNITRACK_CALC'] = AttendanceCalculator(config.thresholds)
 
-    @app.route('/api/health')
-    def health():
-        """Health check endpoint."""
-        return jsonify({
+    # Scrapes all run on one thread, which keeps its browser between them
+    scrape_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='unitrack-scraper')
+
+    def warm_browser():
+        from ..core.scraper import warm_up
+        warm_up(config.headless)
+
+    def run_fetch():
+        from ..core.scraper import fetch_attendance
+        return scrape_executor.submit(fetch_attendance, config).result()
+
+    # Launch the browser now so the first refresh doesn't wait for it
+    scrape_executor.submit(warm_browser)
+
+    # Serialized /api/attendance body, keyed by attendance.json's mtime and the config
+    attendance_cache = {}
+
+    def to_json(payload) -> bytes:
+        """Serialize a payload straight to response bytes (orjson if installed)."""
+        if orjson is not None:
+            return orjson.dumps(payload, default=app.json.default, option=orjson.OPT_SORT_KEYS)
+        return app.json.dumps(payload).encode()
+
+    def json_response(body: bytes, etag: str = None, status: int = 200):
+        response = app.response_class(body, status=status, mimetype='application/json')
+        if etag:
+            # Clients may keep the body but must revalidate it each time
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def not_modified(etag: str):
+        """304 for a client whose If-None-Match already holds etag, else None."""
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+        return None
+
+    @app.after_request
+    def compress(response):
+        """Gzip JSON responses for clients that send Accept-Encoding: gzip."""
+        response.vary.add('Accept-Encoding')
+        if (response.mimetype == 'application/json'
+                and response.status_code == 200
+                and not response.direct_passthrough
+                and 'Content-Encoding' not in response.headers
+                and 'gzip' in request.headers.get('Accept-Encoding', '')):
+            body = response.get_data()
+            if len(body) >= COMPRESS_MIN_SIZE:
+                response.set_data(_gzip(body))
+                response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+    @lru_cache(maxsize=1)
+    def health_body(second: int) -> bytes:
+        return to_json({
             'status': 'ok',
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.fromtimestamp(second).isoformat(),
             'institution': config.institution.name,
         })
 
+    @app.route('/api/health')
+    def health():
+        """Health check endpoint."""
+        return json_response(health_body(int(time.time())))
+
     @app.route('/api/attendance')
     def get_attendance():
         """Get attendance data with analysis."""
@@ -50,49 +133,60 @@ def create_app(config: Config = None) -> Flask:
         if refresh:
             # Fetch fresh data
             try:
-                from ..core.scraper import fetch_attendance
-                subjects = fetch_attendance(config)
+                subjects = run_fetch()
                 if not subjects:
-                    return jsonify({
+                    return json_response(to_json({
                         'success': False,
                         'error': 'Failed to fetch data'
-                    }), 500
+                    }), status=500)
             except Exception as e:
-                return jsonify({
+                return json_response(to_json({
                     'success': False,
                     'error': str(e)
-                }), 500
-        else:
-            # Load cached data
-            data_path = get_data_path('attendance.json')
-            if not data_path.exists():
-                return jsonify({
-                    'success': False,
-                    'error': 'No data available. Use ?refresh=true to fetch.'
-                }), 404
+                }), status=500)
+
+        data_path = get_data_path('attendance.json')
+        if not refresh and not data_path.exists():
+            return json_response(to_json({
+                'success': False,
+                'error': 'No data available. Use ?refresh=true to fetch.'
+            }), status=404)
 
-            with open(data_path) as f:
-                cached = json.load(f)
+        # Reuse the last response until attendance.json or the config
+        # (thresholds, student details) changes
+        stat = data_path.stat()
+        config_tag = config_etag(config_body())
+        cache_key = (stat.st_mtime_ns, config_tag)
+        etag = f'{stat.st_mtime_ns:x}-{stat.st_size:x}-{config_tag}'
+        if not refresh:
+            response = not_modified(etag)
+            if response is not None:
+                return response
 
-            subjects = cached.get('subjects', [])
+        body = None if refresh else attendance_cache.get(cache_key)
+        if body is None:
+            if refresh:
+                # Just written by the scraper; no need to read it back
+                last_fetched = datetime.now().isoformat()
+            else:
+                stored = load_data_file(data_path)
+                subjects = stored.get('subjects', [])
+                last_fetched = stored.get('timestamp')
+            body = build_attendance_body(subjects, last_fetched)
+            attendance_cache.clear()
+            attendance_cache[cache_key] = body
+        return json_response(body, etag)
 
+    def build_attendance_body(subjects: list, last_fetched) -> bytes:
+        """Analyze the subjects and serialize the /api/attendance response."""
         # Analyze
-        calc = AttendanceCalculator(config.thresholds)
         analysis = calc.analyze_all(subjects)
         priority = calc.get_priority_subjects(analysis)
 
         # Get semester from first subject
         semester = subjects[0].get('term', '') if subjects else ''
 
-        # Load timestamp
-        data_path = get_data_path('attendance.json')
-        last_fetched = None
-        if data_path.exists():
-            with open(data_path) as f:
-                cached = json.load(f)
-                last_fetched = cached.get('timestamp')
-
-        return jsonify({
+        return to_json({
             'success': True,
             'institution': config.institution.name,
             'studentName': config.student_name,
@@ -107,10 +201,10 @@ def create_app(config: Config = None) -> Flask:
             'priority': priority[:5],
         })
 
-    @app.route('/api/config')
-    def get_config():
-        """Get public configuration."""
-        return jsonify({
+    @lru_cache(maxsize=1)
+    def config_body() -> bytes:
+        # The config doesn't change while the server runs
+        return to_json({
             'institution': {
                 'name': config.institution.name,
                 'shortName': config.institution.short_name,
@@ -129,41 +223,57 @@ def create_app(config: Config = None) -> Flask:
             }
         })
 
+    @app.route('/api/config')
+    def get_config():
+        """Get public configuration."""
+        body = config_body()
+        etag = config_etag(body)
+        return not_modified(etag) or json_response(body, etag)
+
+    @lru_cache(maxsize=1)
+    def config_etag(body: bytes) -> str:
+        return hashlib.sha1(body).hexdigest()[:16]
+
     @app.route('/api/refresh', methods=['POST'])
     def refresh_data():
         """Fetch fresh data from ERP."""
         try:
-            from ..core.scraper import fetch_attendance
-            subjects = fetch_attendance(config)
+            subjects = run_fetch()
 
             if subjects:
-                calc = AttendanceCalculator(config.thresholds)
                 analysis = calc.analyze_all(subjects)
 
-                return jsonify({
+                return json_response(to_json({
                     'success': True,
                     'message': f'Fetched {len(subjects)} subjects',
                     'summary': analysis['summary']
-                })
+                }))
             else:
-                return jsonify({
+                return json_response(to_json({
                     'success': False,
                     'error': 'No data fetched'
-                }), 500
+                }), status=500)
 
         except Exception as e:
-            return jsonify({
+            return json_response(to_json({
                 'success': False,
                 'error': str(e)
-            }), 500
+            }), status=500)
+
+    # Serve static files (React build). send_from_directory answers
+    # conditional GETs and hands the file to the server's wsgi.file_wrapper
+    @app.route('/assets/<path:filename>')
+    def assets(filename):
+        """Serve fingerprinted build assets."""
+        return send_from_directory(STATIC_FOLDER / 'assets', filename,
+                                   max_age=ASSET_MAX_AGE, conditional=True)
 
-    # Serve static files (React build)
     @app.route('/')
     def index():
         """Serve main page."""
-        static_folder = Path(__file__).parent / 'static'
-        if (static_folder / 'index.html').exists():
-            return send_from_directory(static_folder, 'index.html')
+        if (STATIC_FOLDER / 'index.html').exists():
+            return send_from_directory(STATIC_FOLDER, 'index.html',
+                                       max_age=INDEX_MAX_AGE, conditional=True)
         else:
             # Return simple HTML if no React build
             return f'''
@@ -205,7 +315,23 @@ def create_app(config: Config = None) -> Flask:
     return app
 
 
-def run_server(config: Config = None, host: str = '127.0.0.1', port: int = 5000):
-    """Run the web server."""
+def run_server(config: Optional[Config] = None, host: str = '127.0.0.1', port: int = 5000,
+               debug: Optional[bool] = None):
+    """
+    Run the web server.
+
+    Serves with waitress. Flask's debug server (reloader and debugger) is
+    used only when debug is set, or by default with UNITRACK_ENV=dev; its
+    reloader runs the app twice, and with it a second browser.
+    """
+    if debug is None:
+        debug = os.getenv('UNITRACK_ENV') == 'dev'
+
     app = create_app(config)
-    app.run(host=host, port=port, debug=True)
+    if debug:
+        app.run(host=host, port=port, debug=True)
+    else:
+        from waitress import serve
+        # Scrapes run on the app's own scraper thread, so these threads
+        # only serve API requests
+        serve(app, host=host, port=port, threads=8)